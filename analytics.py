@@ -0,0 +1,216 @@
+import json
+from array import array
+from datetime import date
+
+import partitions
+
+PRESENT = ord('P')
+ABSENT = ord('A')
+
+
+class AttendanceMatrix:
+    """One subject's attendance as a student x class-day matrix.
+
+    Students are held in an ``array`` of ids, class dates in a list and the
+    cells in one ``bytearray`` (``P`` present, ``A`` absent, ``.`` no
+    record), so statistics are computed with C-level bytes operations on
+    whole rows and strided columns instead of per-record Python code.
+    """
+
+    __slots__ = ('student_ids', 'names', 'dates', 'cells')
+
+    def __init__(self, student_ids, names, dates, cells):
+        self.student_ids = student_ids
+        self.names = names
+        self.dates = dates
+        self.cells = cells
+
+    @property
+    def shape(self):
+        return len(self.student_ids), len(self.dates)
+
+    def row(self, i):
+        width = len(self.dates)
+        return bytes(self.cells[i * width:(i + 1) * width])
+
+    def column(self, j):
+        return bytes(self.cells[j::len(self.dates)])
+
+
+def _filters(subject, teacher_id, date_from, date_to):
+    where = ['subject = ?']
+    params = [subject]
+    if teacher_id is not None:
+        where.append('teacher_id = ?')
+        params.append(teacher_id)
+    if date_from:
+        where.append('date >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append('date <= ?')
+        params.append(date_to)
+    return ' AND '.join(where), params
+
+
+def load(db, subject, teacher_id=None, date_from=None, date_to=None):
+    """Load one subject's attendance into an ``AttendanceMatrix``.
+
+    Rows are the students with at least one record in range (ordered by
+    id), columns the dates on which the class met. SQLite returns one row
+    per date with that day's student ids and statuses concatenated, read
+    in order from the covering subject index (live and archived tables
+    alike), so only a few hundred rows cross into Python.
+    """
+    where, params = _filters(subject, teacher_id, date_from, date_to)
+    columns = []
+    for table in partitions.sources(db, date_from, date_to):
+        columns += db.execute(f'''
+            SELECT date, group_concat(student_id),
+                   group_concat(CASE status WHEN 'present' THEN 'P' ELSE 'A' END, '')
+            FROM {table} WHERE {where}
+            GROUP BY date ORDER BY date
+        ''', params).fetchall()
+    # An archived term's dates never appear in the live table
+    columns.sort(key=lambda column: column[0])
+
+    # A class usually has the same students every day, so each distinct id
+    # list is parsed only once
+    id_lists = {}
+    for _, ids, _ in columns:
+        if ids not in id_lists:
+            id_lists[ids] = array('l', map(int, ids.split(',')))
+    student_ids = array('l', sorted(set().union(*id_lists.values())))
+    names = dict(db.execute(
+        'SELECT id, name FROM users WHERE id IN (SELECT value FROM json_each(?))',
+        (json.dumps(student_ids.tolist()),)
+    ).fetchall())
+
+    dates = [column[0] for column in columns]
+    width = len(dates)
+    cells = bytearray(b'.') * (len(student_ids) * width)
+    row_of = {student_id: i for i, student_id in enumerate(student_ids)}
+    offsets = {}
+    for j, (_, ids, statuses) in enumerate(columns):
+        if id_lists[ids] == student_ids:
+            # Every student has a record: assign the whole column at once
+            cells[j::width] = statuses.encode('ascii')
+            continue
+        if ids not in offsets:
+            offsets[ids] = [row_of[student_id] * width for student_id in id_lists[ids]]
+        for offset, status in zip(offsets[ids], statuses.encode('ascii')):
+            cells[offset + j] = status
+    return AttendanceMatrix(student_ids, [names.get(sid, '') for sid in student_ids], dates, cells)
+
+
+def percent(present, total):
+    return round(present * 100 / total, 2) if total else 0
+
+
+def absence_streaks(row):
+    """Longest and current run of consecutive absences in a row of cells.
+
+    Days without a record (``.``) do not break a streak.
+    """
+    marks = row.replace(b'.', b'')
+    runs = marks.split(b'P')
+    return max(map(len, runs)), len(runs[-1])
+
+
+def student_summaries(matrix):
+    """Per-student totals, percentage and absence streaks, in row order."""
+    result = []
+    for i, student_id in enumerate(matrix.student_ids):
+        row = matrix.row(i)
+        present = row.count(PRESENT)
+        total = present + row.count(ABSENT)
+        longest, current = absence_streaks(row)
+        result.append({
+            'id': student_id,
+            'name': matrix.names[i],
+            'present_count': present,
+            'total_classes': total,
+            'attendance_percent': percent(present, total),
+            'longest_absence_streak': longest,
+            'current_absence_streak': current,
+        })
+    return result
+
+
+def daily_totals(matrix):
+    """``(date, present, total)`` for every class day, from strided columns."""
+    totals = []
+    for j, day in enumerate(matrix.dates):
+        column = matrix.column(j)
+        present = column.count(PRESENT)
+        totals.append((day, present, present + column.count(ABSENT)))
+    return totals
+
+
+def _week(day):
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def _month(day):
+    return day[:7]
+
+
+def trends(matrix, period='week', daily=None):
+    """Present/total/percentage per ISO week (``week``) or month (``month``)."""
+    key = _week if period == 'week' else _month
+    buckets = {}
+    for day, present, total in daily if daily is not None else daily_totals(matrix):
+        bucket = buckets.setdefault(key(day), [0, 0, 0])
+        bucket[0] += present
+        bucket[1] += total
+        bucket[2] += 1
+    return [
+        {'period': name, 'present': p, 'total': t, 'class_days': d, 'attendance_percent': percent(p, t)}
+        for name, (p, t, d) in buckets.items()
+    ]
+
+
+def below_threshold(summaries, threshold=75):
+    """Students under ``threshold`` percent, lowest first."""
+    low = [s for s in summaries if s['total_classes'] and s['attendance_percent'] < threshold]
+    low.sort(key=lambda s: (s['attendance_percent'], -s['current_absence_streak']))
+    return low
+
+
+def heatmap(matrix, student_ids):
+    """Rows of ``(student id, name, cells)`` for the given students.
+
+    ``cells`` is the row as a ``str`` of ``P``/``A``/``.``, one per date.
+    """
+    index = {student_id: i for i, student_id in enumerate(matrix.student_ids)}
+    return [(sid, matrix.names[index[sid]], matrix.row(index[sid]).decode('ascii'))
+            for sid in student_ids if sid in index]
+
+
+def analyse(db, subject, teacher_id=None, date_from=None, date_to=None, threshold=75, heatmap_rows=50):
+    """Everything the analytics pages show, from a single matrix load."""
+    matrix = load(db, subject, teacher_id, date_from, date_to)
+    summaries = student_summaries(matrix)
+    daily = daily_totals(matrix)
+    low = below_threshold(summaries, threshold)
+    present = sum(p for _, p, _ in daily)
+    total = sum(t for _, _, t in daily)
+
+    # Heatmap of the students most in need of attention, then the rest in id order
+    focus = [s['id'] for s in low[:heatmap_rows]]
+    if len(focus) < heatmap_rows:
+        chosen = set(focus)
+        focus += [sid for sid in matrix.student_ids if sid not in chosen][:heatmap_rows - len(focus)]
+
+    return {
+        'students': len(matrix.student_ids),
+        'class_days': len(matrix.dates),
+        'present_count': present,
+        'total_classes': total,
+        'attendance_percent': percent(present, total),
+        'weekly': trends(matrix, 'week', daily),
+        'monthly': trends(matrix, 'month', daily),
+        'below_threshold': low,
+        'dates': matrix.dates,
+        'heatmap': heatmap(matrix, focus),
+    }
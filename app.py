@@ -1,67 +1,832 @@
+import atexit
+import hashlib
+import hmac
+import json
 import os
 import sqlite3
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, date
+import threading
+import click
+import time
+from flask import (Flask, render_template, request, redirect, url_for, flash, session, g, jsonify, make_response,
+                   Response, stream_with_context, get_flashed_messages, before_render_template,
+                   template_rendered)
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import generate_password_hash
+from datetime import datetime, date, timezone
 from functools import wraps
+from db import ConnectionPool, PoolTimeout, file_lock
+from cache import TTLCache
+from instrumentation import InstrumentedConnection, MetricsRegistry, RequestStats, current_request, prometheus_text
+import migrations
+from attendance import FormError, build_rows, parse_id
+from bitmaps import AttendanceBitmaps
+import reports
+import analytics
+import partitions
+import summary
+import exports
+import roster
+from auth import PasswordVerifier, TokenBucketLimiter, VerifierBusy, needs_rehash
+from ingest import STATUSES, CheckinQueue, QueueFull, parse_events
+from events import EventBus, format_event
+from jobs import Job, JobBusy, JobScheduler
+from sessions import MemorySessionStore, SQLiteSessionStore, ServerSessionInterface
+from repository import ArchivedTermError, ConstraintError, SQLAlchemyRepository, SQLiteRepository, make_engine, same_sqlite_file
 
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = 'smartattendancesystem'  # For session management
 app.config['DATABASE'] = 'database.db'
+app.config['DB_POOL_SIZE'] = 10
+app.config['DB_POOL_TIMEOUT'] = 10.0
+app.config['DB_BUSY_TIMEOUT_MS'] = 5000
+app.config['DB_CACHE_SIZE_KB'] = 20000
+app.config['STORAGE_BACKEND'] = 'sqlite'  # or 'sqlalchemy' for a pooled SQLAlchemy engine
+app.config['STORAGE_URL'] = None  # SQLAlchemy database URL; defaults to the DATABASE file
+app.config['REPORT_PAGE_SIZE'] = 50
+app.config['REPORT_MAX_PAGE_SIZE'] = 500
+app.config['STREAM_BUFFER_SIZE'] = 64
+app.config['ROSTER_IMPORT_WORKERS'] = None  # defaults to the CPU count
+app.config['USER_CACHE_SIZE'] = 1024
+app.config['USER_CACHE_TTL'] = 300
+app.config['METRICS_WINDOW'] = 1024  # latency samples kept per endpoint
+app.config['N_PLUS_ONE_THRESHOLD'] = 20  # same statement more often than this in one request
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt'  # older hashes are upgraded on the next login
+app.config['PASSWORD_WORKERS'] = 4
+app.config['PASSWORD_MAX_QUEUE'] = 64
+app.config['PASSWORD_TIMEOUT'] = 10.0
+app.config['LOGIN_RATE_PER_USERNAME'] = (5, 1 / 12)  # failed attempts per username and address: burst, regained per second
+app.config['LOGIN_RATE_PER_IP'] = (200, 2.0)  # failed attempts only, so a shared campus IP can still log everyone in
+app.config['PROXY_FIX_X_FOR'] = 0  # trusted reverse proxies in front of the app (X-Forwarded-For hops)
+app.config['SESSION_BACKEND'] = 'sqlite'  # 'memory' is faster but only works with a single worker process
+app.config['SESSION_LIFETIME'] = 8 * 3600  # idle seconds before a login expires
+app.config['SESSION_REFRESH_AFTER'] = 60  # rewrite an unchanged session's expiry at most this often
+app.config['SESSION_SWEEP_INTERVAL'] = 300
+app.config['RESPONSE_CACHE_SIZE'] = 256  # rendered pages kept per process
+app.config['RESPONSE_CACHE_TTL'] = 300
+app.config['STATIC_MAX_AGE'] = 365 * 24 * 3600  # fingerprinted static URLs never change
+app.config['BUILD_ID'] = None  # e.g. the deployed git commit; code, templates and static files are hashed too
+app.config['ANALYTICS_THRESHOLD'] = 75  # attendance % below which students are flagged
+app.config['ANALYTICS_HEATMAP_ROWS'] = 50
+app.config['ANALYTICS_LIST_ROWS'] = 200  # flagged students listed on the page
+app.config['INGEST_TOKENS'] = ()  # kiosk/RFID reader API tokens; empty disables /api/checkins
+app.config['INGEST_MAX_EVENTS'] = 1000  # per request
+app.config['INGEST_FLUSH_SIZE'] = 500
+app.config['INGEST_FLUSH_INTERVAL'] = 1.0  # seconds
+app.config['INGEST_MAX_PENDING'] = 50000
+app.config['INGEST_SPOOL_DIR'] = 'spool'  # None keeps queued check-ins in memory only
+app.config['INGEST_FSYNC'] = False  # fsync the spool on every request
+app.config['EVENTS_MAX_STREAMS'] = 4  # live-update streams per process; each holds a worker thread
+app.config['EVENTS_QUEUE_SIZE'] = 100  # undelivered events kept per stream
+app.config['EVENTS_HEARTBEAT'] = 15  # seconds between keep-alives and cross-worker change checks
+app.config['EVENTS_STREAM_TIMEOUT'] = 300  # streams end after this; the browser reconnects
+app.config['EVENTS_RETRY_MS'] = 3000
+app.config['BITMAP_INDEX'] = False  # keep attendance as in-memory bitsets for dashboard totals
+app.config['BITMAP_INDEX_REBUILD_AFTER'] = 2.0  # seconds behind the database before rebuilding
+app.config['BITMAP_INDEX_CHECK_INTERVAL'] = 1.0  # seconds between checks for other workers' writes
+app.config['JOBS_ENABLED'] = True  # run the background job scheduler in each worker
+app.config['JOBS_WORKERS'] = 2
+app.config['JOBS_POLL_INTERVAL'] = 30  # seconds between checks for due jobs
+app.config['JOBS_STALE_AFTER'] = 3600  # a run still 'running' after this is presumed dead
+app.config['JOBS_AGGREGATES_AT'] = '02:00'  # local times of the daily jobs
+app.config['JOBS_MAINTENANCE_AT'] = '03:30'
+app.config['JOBS_DAY_CLOSE_AT'] = '18:00'
+app.config['JOBS_SNAPSHOT_INTERVAL'] = 900  # seconds between admin report snapshots
+app.config['JOBS_VACUUM_FREE_RATIO'] = 0.2  # VACUUM once this share of pages is free
 
 # Database helper functions
+def get_pool():
+    pool = app.extensions.get('db_pool')
+    if pool is None or pool.database != app.config['DATABASE']:
+        pool = ConnectionPool(
+            app.config['DATABASE'],
+            max_size=app.config['DB_POOL_SIZE'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+            cache_size_kb=app.config['DB_CACHE_SIZE_KB'],
+            factory=InstrumentedConnection,
+        )
+        app.extensions['db_pool'] = pool
+    return pool
+
 def get_db():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    conn.row_factory = sqlite3.Row
-    return conn
+    # One pooled connection per request/app context
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
 
-def init_db():
+# Users and attendance go through the repository. Reports, analytics, terms,
+# summaries, sessions and jobs still use get_db(), so both backends must point
+# at the same SQLite file for now (see "Storage Backends" in the README)
+def get_repository():
+    repository = app.extensions.get('repository')
+    if repository is None:
+        if app.config['STORAGE_BACKEND'] == 'sqlalchemy':
+            url = app.config['STORAGE_URL'] or f"sqlite:///{os.path.abspath(app.config['DATABASE'])}"
+            if not same_sqlite_file(url, app.config['DATABASE']):
+                # Reports, analytics, partitions, summaries, sessions and jobs still use
+                # the DATABASE file directly, so another store would split the data
+                raise RuntimeError(f"STORAGE_URL must point at the DATABASE file ({app.config['DATABASE']}) "
+                                   f"until the rest of the app is ported; got {url}")
+            repository = SQLAlchemyRepository(make_engine(
+                url,
+                pool_size=app.config['DB_POOL_SIZE'],
+                pool_timeout=app.config['DB_POOL_TIMEOUT'],
+                busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+            ))
+        else:
+            repository = SQLiteRepository(get_db)
+        app.extensions['repository'] = repository
+    return repository
+
+@app.teardown_appcontext
+def close_db(exception=None):
+    db = g.pop('db', None)
+    if db is not None:
+        get_pool().release(db)
+
+# Request instrumentation: SQL count/time, render time and latency per endpoint
+def get_metrics():
+    metrics = app.extensions.get('metrics')
+    if metrics is None:
+        metrics = MetricsRegistry(app.config['METRICS_WINDOW'], app.config['N_PLUS_ONE_THRESHOLD'])
+        app.extensions['metrics'] = metrics
+    return metrics
+
+@app.before_request
+def start_request_stats():
+    g.request_stats = RequestStats()
+    current_request.set(g.request_stats)
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_render_timer(sender, template, context, **extra):
+    stats = g.get('request_stats')
+    started = g.pop('render_started', None)
+    if stats is not None and started is not None:
+        stats.render_time += time.perf_counter() - started
+
+@app.after_request
+def add_server_timing(response):
+    stats = g.get('request_stats')
+    if stats is not None:
+        g.request_failed = response.status_code >= 500
+        response.headers['Server-Timing'] = (
+            f'sql;dur={stats.sql_time * 1000:.2f};desc="{stats.query_count} queries", '
+            f'render;dur={stats.render_time * 1000:.2f}'
+        )
+    return response
+
+@app.teardown_request
+def record_request_stats(exception=None):
+    stats = g.pop('request_stats', None)
+    current_request.set(None)
+    if stats is not None:
+        elapsed = time.perf_counter() - stats.started
+        failed = exception is not None or g.get('request_failed', False)
+        get_metrics().observe(request.endpoint or 'unknown', stats, elapsed, error=failed)
+
+# Static assets are fingerprinted with a content hash so browsers can keep them
+_static_versions = {}
+
+def static_version(filename):
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _static_versions.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.sha1(f.read()).hexdigest()[:12])
+        _static_versions[filename] = cached
+    return cached[1]
+
+def build_fingerprint():
+    # Changes with every deploy that touches code, templates or static files;
+    # computed once per worker, or per request while templates auto-reload
+    fingerprint = app.extensions.get('build_fingerprint')
+    if fingerprint is None or app.debug or app.config['TEMPLATES_AUTO_RELOAD']:
+        digest = hashlib.sha1(repr(app.config['BUILD_ID']).encode())
+        paths = [os.path.join(app.root_path, name) for name in os.listdir(app.root_path) if name.endswith('.py')]
+        for folder in (os.path.join(app.root_path, app.template_folder), app.static_folder):
+            paths += [os.path.join(root, name) for root, _, names in os.walk(folder) for name in names]
+        for path in sorted(paths):
+            with open(path, 'rb') as f:
+                digest.update(os.path.relpath(path, app.root_path).encode() + b'\0' + f.read())
+        fingerprint = app.extensions['build_fingerprint'] = digest.hexdigest()[:12]
+    return fingerprint
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        version = static_version(values['filename'])
+        if version is not None:
+            values['v'] = version
+
+@app.after_request
+def cache_static_assets(response):
+    if request.endpoint == 'static' and 'v' in request.args and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['STATIC_MAX_AGE']
+        response.cache_control.immutable = True
+    return response
+
+# Login throttling and offloaded password hashing
+def get_login_limiters():
+    limiters = app.extensions.get('login_limiters')
+    if limiters is None:
+        limiters = {
+            'username': TokenBucketLimiter(*app.config['LOGIN_RATE_PER_USERNAME']),
+            'ip': TokenBucketLimiter(*app.config['LOGIN_RATE_PER_IP']),
+        }
+        app.extensions['login_limiters'] = limiters
+    return limiters
+
+def get_password_verifier():
+    verifier = app.extensions.get('password_verifier')
+    if verifier is None:
+        verifier = PasswordVerifier(
+            app.config['PASSWORD_WORKERS'],
+            app.config['PASSWORD_MAX_QUEUE'],
+            app.config['PASSWORD_TIMEOUT']
+        )
+        app.extensions['password_verifier'] = verifier
+    return verifier
+
+def hash_password(password):
+    return generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
+
+# Cached user lookups; write routes must call invalidate_users()
+def get_user_cache():
+    user_cache = app.extensions.get('user_cache')
+    if user_cache is None:
+        user_cache = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+        app.extensions['user_cache'] = user_cache
+    return user_cache
+
+def get_user_profile(user_id):
+    def load():
+        return get_repository().get_user(user_id)
+    return get_user_cache().get_or_load(('user', int(user_id)), load)
+
+def get_roster(role):
+    def load():
+        return tuple(get_repository().list_users(role))
+    return get_user_cache().get_or_load(('roster', role), load)
+
+def invalidate_users(*user_ids):
+    get_user_cache().invalidate(
+        ('roster', 'student'), ('roster', 'teacher'), ('roster', 'admin'),
+        *(('user', int(user_id)) for user_id in user_ids)
+    )
+    get_user_cache().invalidate_prefix('sections', 'section', 'enrolled')
+    # The write bumped the users version read earlier in this request
+    g.pop('data_versions', None)
+
+# Section rosters; a teacher without sections (or a school without any)
+# marks from the full student roster. Keys carry the users data version, so
+# section and enrolment changes made by another process (the CLI, another
+# worker) are picked up on the next request rather than after the TTL.
+def users_version():
+    return get_data_versions()['users'][0]
+
+def get_sections(teacher_id=None):
+    def load():
+        return tuple(get_repository().sections(teacher_id))
+    return get_user_cache().get_or_load(('sections', teacher_id, users_version()), load)
+
+def get_section_students(section_id):
+    def load():
+        return tuple(get_repository().section_students(section_id))
+    return get_user_cache().get_or_load(('section', int(section_id), users_version()), load)
+
+def select_section(sections, section_id):
+    # The requested section, else the first one
+    return next((s for s in sections if str(s['id']) == str(section_id)), sections[0] if sections else None)
+
+def teacher_section_ids(teacher_id):
+    # For report filters: None when the teacher sees every student
+    return [section['id'] for section in get_sections(teacher_id)] or None
+
+def teacher_student_ids(teacher_id):
+    # Students a teacher may mark, or None for everyone
+    def load():
+        sections = get_sections(teacher_id)
+        if not sections:
+            return None
+        return frozenset(student['id'] for section in sections for student in get_section_students(section['id']))
+    return get_user_cache().get_or_load(('enrolled', int(teacher_id), users_version()), load)
+
+# Live updates: attendance writes are published to open /events streams
+def get_event_bus():
+    bus = app.extensions.get('event_bus')
+    if bus is None:
+        bus = EventBus(app.config['EVENTS_QUEUE_SIZE'])
+        app.extensions['event_bus'] = bus
+    return bus
+
+def get_stream_slots():
+    slots = app.extensions.get('event_stream_slots')
+    if slots is None:
+        slots = threading.BoundedSemaphore(app.config['EVENTS_MAX_STREAMS'])
+        app.extensions['event_stream_slots'] = slots
+    return slots
+
+def data_version():
+    # Grows with every attendance or user write in any worker
+    return sum(version for version, _ in get_repository().data_versions().values())
+
+def dashboard_totals():
+    repository = get_repository()
+    return {
+        'total_students': repository.count_users('student'),
+        'total_teachers': repository.count_users('teacher'),
+        'total_attendance': repository.total_records(),
+    }
+
+def teacher_totals(teacher_id, day):
+    index = get_bitmap_index()
+    if index is not None:
+        present, total = index.day_totals(teacher_id, day)
+    else:
+        present, total = get_repository().teacher_day_totals(teacher_id, day)
+    return {'date': day, 'today_present': present, 'today_total': total}
+
+def publish_attendance(rows):
+    # Counts are only computed for topics somebody is listening to
+    bus = get_event_bus()
+    groups = {}
+    for student_id, teacher_id, day, status, subject, notes in rows:
+        if bus.listening(f'teacher:{teacher_id}'):
+            groups.setdefault((teacher_id, day, subject), {})[str(student_id)] = [status, notes]
+    admin = bus.listening('admin')
+    if not groups and not admin:
+        return
+    version = data_version()
+    if admin:
+        bus.publish('admin', 'totals', dict(dashboard_totals(), version=version))
+    for (teacher_id, day, subject), marks in groups.items():
+        bus.publish(f'teacher:{teacher_id}', 'attendance',
+                    dict(teacher_totals(teacher_id, day), subject=subject, marks=marks, version=version))
+
+# Optional in-memory bitmap index of attendance; None whenever it is disabled,
+# still building or behind the database, and callers then use SQL
+_bitmap_build_lock = threading.Lock()
+
+def get_bitmap_index():
+    if not app.config['BITMAP_INDEX']:
+        return None
+    index = app.extensions.get('bitmap_index')
+    if index is None:
+        rebuild_bitmap_index()
+        return None
+    # This worker's writes are applied in place; other workers' writes are
+    # looked for at most every BITMAP_INDEX_CHECK_INTERVAL seconds
+    now = time.monotonic()
+    if not index.stale and index.checked_at is not None and \
+            now - index.checked_at < app.config['BITMAP_INDEX_CHECK_INTERVAL']:
+        return index
+    if not index.stale and index.version == get_data_versions()['attendance'][0]:
+        index.checked_at = now
+        index.behind_since = None
+        return index
+    index.checked_at = None
+    # Another process wrote (or this one is between commit and apply); rebuild
+    # only if the gap persists
+    if index.behind_since is None:
+        index.behind_since = now
+    elif now - index.behind_since >= app.config['BITMAP_INDEX_REBUILD_AFTER']:
+        rebuild_bitmap_index()
+    return None
+
+def rebuild_bitmap_index(wait=False):
+    # One build at a time, in the background unless wait is set (which also
+    # waits out a build already running)
+    if not _bitmap_build_lock.acquire(blocking=wait):
+        return
+    def build():
+        try:
+            with app.app_context():
+                app.extensions['bitmap_index'] = AttendanceBitmaps.build(get_db())
+        except Exception:
+            app.logger.exception('Building the attendance bitmap index failed')
+        finally:
+            _bitmap_build_lock.release()
+    if wait:
+        build()
+    else:
+        threading.Thread(target=build, name='bitmap-index', daemon=True).start()
+
+def attendance_written(rows):
+    # Every successful attendance write ends here
+    index = app.extensions.get('bitmap_index')
+    if index is not None:
+        index.apply(rows)
+    # Versions read earlier in this request are out of date now
+    g.pop('data_versions', None)
+    publish_attendance(rows)
+
+# Kiosk check-ins are written behind the request by a background thread
+def write_checkins(rows):
     with app.app_context():
-        db = get_db()
-        with open('schema.sql', 'r') as f:
-            db.executescript(f.read())
-        db.commit()
+        repository = get_repository()
+        try:
+            repository.record_attendance(rows)
+        except ConstraintError:
+            # Rows were valid when accepted, but a term may have been archived or a
+            # user deleted since; drop those instead of requeueing the batch forever
+            rows = drop_invalid_checkins(repository, rows)
+            try:
+                repository.record_attendance(rows)
+            except ConstraintError:
+                rows = [row for row in rows if write_checkin(repository, row)]
+        attendance_written(rows)
+
+def drop_invalid_checkins(repository, rows):
+    closed = repository.archived_ranges()
+    students = {user['id'] for user in repository.list_users('student')}
+    teachers = {user['id'] for user in repository.list_users('teacher')}
+    kept = []
+    for row in rows:
+        if row[0] not in students or row[1] not in teachers:
+            app.logger.warning('Dropped check-in %r: student or teacher no longer exists', row)
+        elif any(start <= row[2] <= end for start, end in closed):
+            app.logger.warning('Dropped check-in %r: dated in an archived term', row)
+        else:
+            kept.append(row)
+    return kept
+
+def write_checkin(repository, row):
+    # Last resort for a batch that still fails: write rows one by one, dropping the bad ones
+    try:
+        repository.record_attendance([row])
+        return True
+    except ConstraintError as e:
+        app.logger.warning('Dropped check-in %r: %s', row, e)
+        return False
+
+def get_checkin_queue():
+    queue = app.extensions.get('checkin_queue')
+    if queue is None:
+        queue = CheckinQueue(
+            write_checkins,
+            flush_size=app.config['INGEST_FLUSH_SIZE'],
+            flush_interval=app.config['INGEST_FLUSH_INTERVAL'],
+            max_pending=app.config['INGEST_MAX_PENDING'],
+            spool_dir=app.config['INGEST_SPOOL_DIR'],
+            fsync=app.config['INGEST_FSYNC']
+        ).start()
+        atexit.register(queue.stop)
+        app.extensions['checkin_queue'] = queue
+    return queue
+
+# Background jobs; each runs inside an app context on the scheduler's pool
+def aggregates_job():
+    # The summary tables are maintained by triggers; nightly they are checked
+    # against attendance and rebuilt if anything drifted
+    db = get_db()
+    drift = summary.verify(db)
+    if drift:
+        summary.rebuild(db)
+    return {'drifted_rows': len(drift), 'rebuilt': bool(drift)}
+
+def auto_absent_job():
+    # At day close, enrolled students a teacher left unmarked are marked
+    # absent. Teachers who marked nobody today are skipped (no class held).
+    day = date.today().isoformat()
+    repository = get_repository()
+    rows = []
+    for teacher in get_roster('teacher'):
+        enrolled = teacher_student_ids(teacher['id'])
+        if not enrolled:
+            continue
+        marked = repository.day_marks(teacher['id'], day, teacher['subject'])
+        if marked:
+            rows.extend((student_id, teacher['id'], day, 'absent', teacher['subject'], 'Not marked')
+                        for student_id in sorted(enrolled - marked.keys()))
+    try:
+        inserted, _ = repository.record_attendance(rows)
+    except ArchivedTermError:
+        return {'date': day, 'marked_absent': 0, 'skipped': 'archived term'}
+    attendance_written(rows)
+    return {'date': day, 'marked_absent': inserted}
+
+def report_snapshot_job():
+    # All-student totals for the admin reports page, rebuilt only after writes
+    db = get_db()
+    version = data_version()
+    row = db.execute("SELECT data_version FROM report_snapshots WHERE name = 'admin_reports'").fetchone()
+    if row is not None and row[0] == version:
+        return {'unchanged': True}
+    data = {'students': reports.student_stats(db), 'summary': reports.summarize(db)}
+    db.execute(
+        'INSERT OR REPLACE INTO report_snapshots (name, created, data_version, data) VALUES (?, ?, ?, ?)',
+        ('admin_reports', time.time(), version, json.dumps(data, separators=(',', ':')))
+    )
+    db.commit()
+    return {'students': len(data['students'])}
+
+def maintenance_job():
+    # Refresh planner statistics; VACUUM only when enough pages are free,
+    # since it blocks writers while it runs
+    db = get_db()
+    db.execute('ANALYZE')
+    db.commit()
+    pages = db.execute('PRAGMA page_count').fetchone()[0]
+    free = db.execute('PRAGMA freelist_count').fetchone()[0]
+    vacuum = pages > 0 and free / pages >= app.config['JOBS_VACUUM_FREE_RATIO']
+    if vacuum:
+        db.execute('VACUUM')
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return {'pages': pages, 'free_pages': free, 'vacuumed': vacuum}
+
+def get_scheduler():
+    scheduler = app.extensions.get('job_scheduler')
+    if scheduler is None:
+        scheduler = JobScheduler(
+            get_db, app.app_context,
+            workers=app.config['JOBS_WORKERS'],
+            poll_interval=app.config['JOBS_POLL_INTERVAL'],
+            stale_after=app.config['JOBS_STALE_AFTER']
+        )
+        scheduler.add(Job('aggregates', aggregates_job, at=app.config['JOBS_AGGREGATES_AT'],
+                          description='Check the attendance summary tables and rebuild them on drift'))
+        scheduler.add(Job('auto-absent', auto_absent_job, at=app.config['JOBS_DAY_CLOSE_AT'],
+                          description='Mark unmarked enrolled students absent at day close'))
+        scheduler.add(Job('report-snapshot', report_snapshot_job, every=app.config['JOBS_SNAPSHOT_INTERVAL'],
+                          description='Precompute the all-student totals on the admin reports page'))
+        scheduler.add(Job('maintenance', maintenance_job, at=app.config['JOBS_MAINTENANCE_AT'],
+                          description='ANALYZE the database and VACUUM it when pages are free'))
+        app.extensions['job_scheduler'] = scheduler
+    return scheduler
+
+def get_report_snapshot():
+    row = get_db().execute(
+        "SELECT created, data FROM report_snapshots WHERE name = 'admin_reports'"
+    ).fetchone()
+    if row is None:
+        return None
+    return dict(json.loads(row['data']), created=datetime.fromtimestamp(row['created']).strftime('%Y-%m-%d %H:%M'))
+
+# Server-side sessions; the cookie only carries a random session id
+def get_session_store():
+    store = app.extensions.get('session_store')
+    if store is None:
+        if app.config['SESSION_BACKEND'] == 'sqlite':
+            store = SQLiteSessionStore(get_db)
+        else:
+            store = MemorySessionStore()
+        app.extensions['session_store'] = store
+    return store
 
-# Create database tables if they don't exist
+app.session_interface = ServerSessionInterface(get_session_store)
+
+def revoke_sessions(*user_ids):
+    # Log the users out everywhere so their next request re-authenticates
+    store = get_session_store()
+    return sum(store.revoke_user(int(user_id)) for user_id in user_ids)
+
+def migrate_db():
+    # Apply pending schema migrations without touching existing data
+    with app.app_context():
+        return migrations.migrate(
+            get_db(),
+            os.path.join(app.root_path, 'schema.sql'),
+            os.path.join(app.root_path, 'migrations')
+        )
+
+def init_db():
+    return migrate_db()
+
+# Create database tables if they don't exist, upgrade them if they do
 def setup_database():
-    if not os.path.exists(app.config['DATABASE']):
+    if os.path.exists(app.config['DATABASE']):
+        migrate_db()
+    else:
         init_db()
-        # Insert default users
-        db = get_db()
+        with app.app_context():
+            # Insert default users
+            repository = get_repository()
         
-        # Admin
-        db.execute(
-            'INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)',
-            ('MeghaShinde', generate_password_hash('admin123'), 'admin', 'Megha Shinde')
-        )
-        
-        # Teachers
-        teachers = [
-            ('saloni', generate_password_hash('teach123'), 'teacher', 'Saloni Purkar', 'Network & Info Security'),
-            ('ashwini', generate_password_hash('teach456'), 'teacher', 'Ashwini Patil', 'Class Teacher'),
-            ('jyoti', generate_password_hash('teach789'), 'teacher', 'Jyoti Chandwade', 'Mobile App Dev')
-        ]
-        for teacher in teachers:
-            db.execute(
-                'INSERT INTO users (username, password, role, name, subject) VALUES (?, ?, ?, ?, ?)',
-                teacher
-            )
+            # Admin
+            repository.add_user('MeghaShinde', hash_password('admin123'), 'admin', 'Megha Shinde')
         
-        # Students
-        students = [
-            ('vikas', generate_password_hash('stud123'), 'student', 'Vikas Gaikwad'),
-            ('vedant', generate_password_hash('stud456'), 'student', 'Vedant Shivade'),
-            ('rushad', generate_password_hash('stud789'), 'student', 'Rushad Adikane'),
-            ('divesh', generate_password_hash('stud101'), 'student', 'Divesh More')
-        ]
-        for student in students:
-            db.execute(
-                'INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)',
-                student
-            )
+            # Teachers
+            teachers = [
+                ('saloni', hash_password('teach123'), 'teacher', 'Saloni Purkar', 'Network & Info Security'),
+                ('ashwini', hash_password('teach456'), 'teacher', 'Ashwini Patil', 'Class Teacher'),
+                ('jyoti', hash_password('teach789'), 'teacher', 'Jyoti Chandwade', 'Mobile App Dev')
+            ]
+            for teacher in teachers:
+                repository.add_user(*teacher)
         
-        db.commit()
+            # Students
+            students = [
+                ('vikas', hash_password('stud123'), 'student', 'Vikas Gaikwad'),
+                ('vedant', hash_password('stud456'), 'student', 'Vedant Shivade'),
+                ('rushad', hash_password('stud789'), 'student', 'Rushad Adikane'),
+                ('divesh', hash_password('stud101'), 'student', 'Divesh More')
+            ]
+            for student in students:
+                repository.add_user(*student)
+
+# Serving entry point: wsgi.py calls this once in every worker process
+def create_app(config=None):
+    """Configure the app and prepare the database before serving.
+
+    Settings are read from ``FLASK_*`` environment variables (for example
+    ``FLASK_DATABASE`` or ``FLASK_SECRET_KEY``) and then from ``config``.
+    Workers take a lock file next to the database, so the first one runs
+    migrations and seeding while the rest wait instead of racing it.
+    """
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+    if app.config['PROXY_FIX_X_FOR'] and not isinstance(app.wsgi_app, ProxyFix):
+        # Take the client address (for login limits) from the trusted proxies' X-Forwarded-For
+        hops = app.config['PROXY_FIX_X_FOR']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    with file_lock(app.config['DATABASE'] + '.lock'):
+        setup_database()
+        if app.config['INGEST_TOKENS']:
+            # Replay check-ins spooled before an unclean shutdown
+            get_checkin_queue()
+        if app.config['BITMAP_INDEX']:
+            rebuild_bitmap_index()
+        if app.config['JOBS_ENABLED'] and not get_scheduler().started:
+            atexit.register(get_scheduler().start().stop)
+    return app
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending database migrations."""
+    applied = migrate_db()
+    for version, name in applied:
+        print(f'Applied migration {version}: {name}')
+    if not applied:
+        print('Database is up to date.')
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database and default users if it does not exist."""
+    setup_database()
+    print('Database initialized.')
+
+@app.cli.command('summary')
+@click.option('--rebuild', is_flag=True, help='Recompute the summary tables from attendance.')
+def summary_command(rebuild):
+    """Verify (or rebuild) the materialized attendance summary."""
+    with app.app_context():
+        db = get_db()
+        if rebuild:
+            summary.rebuild(db)
+            print('Summary tables rebuilt.')
+        drift = summary.verify(db)
+    for table, key, stored, expected in drift:
+        print(f'{table} {key}: stored={stored} expected={expected}')
+    print(f'{len(drift)} drifted row(s).')
+
+@app.cli.command('terms')
+def terms_command():
+    """List academic terms and their archive status."""
+    with app.app_context():
+        terms = partitions.list_terms(get_db())
+    for term in terms:
+        print(f"{term['name']}: {term['start_date']} to {term['end_date']}, {term['status']}"
+              f"{' (' + str(term['archived_rows']) + ' rows)' if term['status'] == 'archived' else ''}")
+    if not terms:
+        print('No terms defined.')
+
+@app.cli.command('add-term')
+@click.argument('name')
+@click.argument('start_date')
+@click.argument('end_date')
+def add_term_command(name, start_date, end_date):
+    """Define an academic term (dates as YYYY-MM-DD)."""
+    with app.app_context():
+        try:
+            partitions.add_term(get_db(), name, start_date, end_date)
+        except partitions.TermError as e:
+            raise click.ClickException(str(e))
+    print(f'Term {name} added.')
+
+@app.cli.command('archive-term')
+@click.argument('name')
+def archive_term_command(name):
+    """Move a closed term's attendance into the archive table."""
+    with app.app_context():
+        try:
+            moved = partitions.archive_term(get_db(), name)
+        except partitions.TermError as e:
+            raise click.ClickException(str(e))
+    print(f'Archived {moved} attendance row(s) from term {name}.')
+
+@app.cli.command('sections')
+def sections_command():
+    """List class sections with their teachers and enrolment counts."""
+    with app.app_context():
+        repository = get_repository()
+        sections = repository.sections()
+        teachers = {}
+        for teacher in repository.list_users('teacher'):
+            for section in repository.sections(teacher['id']):
+                teachers.setdefault(section['id'], []).append(teacher['username'])
+    for section in sections:
+        print(f"{section['name']}: {section['students']} student(s), "
+              f"teachers: {', '.join(teachers.get(section['id'], [])) or 'none'}")
+    if not sections:
+        print('No sections defined; every teacher marks the full student roster.')
+
+@app.cli.command('add-section')
+@click.argument('name')
+@click.option('--teacher', 'teachers', multiple=True, help='Username of a teacher for this section (repeatable).')
+def add_section_command(name, teachers):
+    """Create a class section, or assign more teachers to an existing one."""
+    with app.app_context():
+        repository = get_repository()
+        teacher_ids = []
+        for username in teachers:
+            teacher = repository.find_login(username, 'teacher')
+            if teacher is None:
+                raise click.ClickException(f'No teacher with username {username}')
+            teacher_ids.append(teacher['id'])
+        section = repository.find_section(name)
+        section_id = section['id'] if section else repository.add_section(name)
+        repository.assign_teachers(section_id, teacher_ids)
+    print(f"Section {name} {'updated' if section else 'added'}.")
+
+@app.cli.command('enrol')
+@click.argument('section_name')
+@click.argument('usernames', nargs=-1, required=True)
+@click.option('--remove', is_flag=True, help='Remove the students from the section instead.')
+def enrol_command(section_name, usernames, remove):
+    """Enrol students (by username) in a section."""
+    with app.app_context():
+        repository = get_repository()
+        section = repository.find_section(section_name)
+        if section is None:
+            raise click.ClickException(f'No section named {section_name}')
+        student_ids = []
+        for username in usernames:
+            student = repository.find_login(username, 'student')
+            if student is None:
+                raise click.ClickException(f'No student with username {username}')
+            student_ids.append(student['id'])
+        if remove:
+            changed = repository.unenrol(section['id'], student_ids)
+        else:
+            changed = repository.enrol(section['id'], student_ids)
+    print(f"{'Removed' if remove else 'Enrolled'} {changed} student(s) {'from' if remove else 'in'} {section_name}.")
+
+@app.cli.command('jobs')
+def jobs_command():
+    """List background jobs and their last run."""
+    with app.app_context():
+        scheduler = get_scheduler()
+        scheduler.register()
+        jobs = scheduler.state()
+    for job in jobs:
+        last = f"{job['status']} in {job['last_duration_ms']} ms" if job.get('last_finished') else 'never run'
+        print(f"{job['name']} ({job['schedule']}): {last}, {job['runs']} run(s), {job['failures']} failure(s)")
+        if job.get('last_error'):
+            print(f"  last error: {job['last_error']}")
+
+@app.cli.command('run-job')
+@click.argument('name')
+def run_job_command(name):
+    """Run a background job now, in this process."""
+    scheduler = get_scheduler()
+    try:
+        result, error = scheduler.run_now(name)
+    except KeyError:
+        raise click.ClickException(f"Unknown job {name}; choose from {', '.join(j.name for j in scheduler.jobs)}")
+    except JobBusy:
+        raise click.ClickException(f'Job {name} is already running.')
+    if error:
+        raise click.ClickException(f'Job {name} failed: {error}')
+    print(f'Job {name} finished: {json.dumps(result)}')
+
+@app.cli.command('import-roster')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--role', type=click.Choice(['student', 'teacher']), default='student')
+@click.option('--workers', type=int, default=None, help='Password hashing processes.')
+def import_roster_command(path, role, workers):
+    """Import students or teachers from a CSV roster."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        text = f.read()
+    with app.app_context():
+        result = roster.import_roster(get_repository(), text, role, workers or app.config['ROSTER_IMPORT_WORKERS'],
+                                      app.config['PASSWORD_HASH_METHOD'])
+    for line, username, message in result['errors']:
+        print(f'line {line} ({username}): {message}')
+    print(f"Imported {result['imported']} {role}(s) in {result['seconds']}s "
+          f"({result['rows_per_second']} rows/s, hashing {result['hash_seconds']}s), "
+          f"{len(result['errors'])} error(s).")
 
 # Authentication helper functions
 def login_required(f):
@@ -99,6 +864,106 @@ def student_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def render_analytics(subject, teacher_id=None, **context):
+    # Shared by the admin and teacher analytics pages
+    date_from = request.args.get('date_from') or None
+    date_to = request.args.get('date_to') or None
+    threshold = request.args.get('threshold', app.config['ANALYTICS_THRESHOLD'], type=int)
+    result = None
+    if subject:
+        result = analytics.analyse(get_db(), subject, teacher_id, date_from, date_to, threshold,
+                                   app.config['ANALYTICS_HEATMAP_ROWS'])
+        if not result['class_days']:
+            result = None
+    return render_template('analytics.html', analytics=result, subject=subject, date_from=date_from,
+                           date_to=date_to, threshold=threshold, list_rows=app.config['ANALYTICS_LIST_ROWS'],
+                           **context)
+
+# Rendered page cache with ETag/Last-Modified validation
+def get_response_cache():
+    response_cache = app.extensions.get('response_cache')
+    if response_cache is None:
+        response_cache = TTLCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+        app.extensions['response_cache'] = response_cache
+    return response_cache
+
+def get_data_versions():
+    # Bumped by triggers on every attendance/user write, so shared by all workers
+    if 'data_versions' not in g:
+        g.data_versions = get_repository().data_versions()
+    return g.data_versions
+
+def cached_page(f):
+    # Serve an unchanged page from memory, or 304 when the browser already has it.
+    # Entries are per user and URL; the ETag includes the data versions and the
+    # build fingerprint, so any attendance or user write, or a deploy, makes every
+    # cached page stale.
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method != 'GET' or wants_stream() or session.get('_flashes'):
+            return f(*args, **kwargs)
+
+        versions = get_data_versions()
+        key = (request.endpoint, session.get('user_id'), request.full_path)
+        etag = hashlib.sha1(repr((key, sorted(versions.items()), build_fingerprint())).encode()).hexdigest()
+        last_modified = datetime.fromtimestamp(max(updated for _, updated in versions.values()), timezone.utc)
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            cached = get_response_cache().get(key)
+            if cached is not None and cached[0] == etag:
+                response = Response(cached[1], mimetype='text/html')
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                get_response_cache().set(key, (etag, response.get_data()))
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request) if response.status_code == 200 else response
+    return decorated_function
+
+# Pagination and streaming helpers
+def get_page_size():
+    page_size = request.args.get('page_size', app.config['REPORT_PAGE_SIZE'], type=int)
+    return max(1, min(page_size, app.config['REPORT_MAX_PAGE_SIZE']))
+
+def page_url(cursor):
+    if cursor is None:
+        return None
+    args = request.args.to_dict()
+    args['cursor'] = cursor
+    return url_for(request.endpoint, **args)
+
+def wants_stream():
+    return request.args.get('stream') == '1'
+
+def export_response(rows, columns, basename):
+    # Stream an export straight from the cursor in the requested format
+    fmt = request.args.get('format', 'csv')
+    mimetype, extension = exports.FORMATS[fmt]
+    filename = f'{basename}-{date.today().isoformat()}.{extension}'
+    return Response(
+        stream_with_context(exports.iter_export(rows, columns, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def render_page(template_name, **context):
+    # ?stream=1 renders the template incrementally, so rows go out as they
+    # are read from the cursor instead of being built into one big string
+    if not wants_stream():
+        return render_template(template_name, **context)
+    # Pop flashed messages now so the session change is saved with the headers
+    get_flashed_messages()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(app.config['STREAM_BUFFER_SIZE'])
+    return Response(stream_with_context(stream), mimetype='text/html')
+
 # Routes
 @app.route('/')
 def index():
@@ -111,25 +976,44 @@ def login():
         password = request.form['password']
         role = request.form['role']
         
-        db = get_db()
-        user = db.execute(
-            'SELECT * FROM users WHERE username = ? AND role = ?',
-            (username, role)
-        ).fetchone()
+        # Both buckets are only charged for failed attempts (below). The username
+        # bucket is per client address too, so bad passwords sent from elsewhere
+        # cannot lock a user out of their own account
+        limiters = get_login_limiters()
+        account = (username, role, request.remote_addr)
+        if not limiters['ip'].check(request.remote_addr) or not limiters['username'].check(account):
+            flash('Too many login attempts. Please wait a moment and try again.')
+            return render_template('login.html'), 429
+        
+        repository = get_repository()
+        user = repository.find_login(username, role)
         
         error = None
-        if user is None:
-            error = 'Invalid username or role.'
-        elif not check_password_hash(user['password'], password):
-            error = 'Incorrect password.'
+        verifier = get_password_verifier()
+        try:
+            if user is None:
+                error = 'Invalid username or role.'
+            elif not verifier.verify(user['password'], password):
+                error = 'Incorrect password.'
+            elif needs_rehash(user['password'], app.config['PASSWORD_HASH_METHOD']):
+                # Transparently upgrade hashes made with an older method or cost
+                repository.update_user(user['id'], password=verifier.hash(password, app.config['PASSWORD_HASH_METHOD']))
+        except VerifierBusy:
+            flash('The server is busy. Please try again in a moment.')
+            return render_template('login.html'), 503, {'Retry-After': '2'}
             
         if error is None:
             # Store user info in session
             session.clear()
+            session.regenerate()
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['name'] = user['name']
             session['role'] = user['role']
+            session['subject'] = user['subject']
+            get_user_cache().set(('user', user['id']), {
+                key: user[key] for key in ('id', 'username', 'role', 'name', 'subject')
+            })
             
             # Redirect based on role
             if role == 'admin':
@@ -139,6 +1023,8 @@ def login():
             else:
                 return redirect(url_for('student_dashboard'))
                 
+        limiters['ip'].spend(request.remote_addr)
+        limiters['username'].spend(account)
         flash(error)
     
     return render_template('login.html')
@@ -159,128 +1045,360 @@ def contact():
         flash('Your message has been sent successfully!')
     return render_template('contact.html')
 
+# Health checks for load balancers and process managers
+@app.route('/healthz')
+def healthz():
+    # Liveness: the worker is up and serving requests
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: the database answers and every migration has been applied
+    try:
+        db = get_db()
+        outstanding = migrations.pending(
+            db,
+            os.path.join(app.root_path, 'schema.sql'),
+            os.path.join(app.root_path, 'migrations')
+        )
+    except (sqlite3.Error, PoolTimeout) as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    if outstanding:
+        return jsonify({'status': 'migrating', 'pending': [version for version, _, _ in outstanding]}), 503
+    return jsonify({'status': 'ready', 'schema_version': migrations.current_version(db), 'db_pool': get_pool().stats()})
+
+# Kiosk API
+@app.route('/api/checkins', methods=['POST'])
+def api_checkins():
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not token or not any(hmac.compare_digest(token, t) for t in app.config['INGEST_TOKENS']):
+        return jsonify({'error': 'invalid or missing API token'}), 401
+
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'request body must be JSON'}), 400
+    events = payload.get('events', [payload]) if isinstance(payload, dict) else payload
+    if isinstance(events, list) and len(events) > app.config['INGEST_MAX_EVENTS']:
+        return jsonify({'error': f"at most {app.config['INGEST_MAX_EVENTS']} events per request"}), 413
+
+    students = {s['id'] for s in get_roster('student')}
+    teachers = {t['id']: t['subject'] for t in get_roster('teacher')}
+    rows, errors = parse_events(payload, students, teachers, closed=get_repository().archived_ranges())
+    if not rows:
+        return jsonify({'accepted': 0, 'errors': errors}), 400
+
+    try:
+        get_checkin_queue().submit(rows)
+    except QueueFull:
+        response = jsonify({'error': 'check-in queue is full, retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    # Accepted for writing; rows reach the attendance table within INGEST_FLUSH_INTERVAL
+    return jsonify({'accepted': len(rows), 'errors': errors}), 202
+
+# Live updates for dashboards and the marking grid
+@app.route('/events')
+@login_required
+def events():
+    role = session.get('role')
+    if role == 'admin':
+        topic = 'admin'
+    elif role == 'teacher':
+        topic = f"teacher:{session['user_id']}"
+    else:
+        # Nothing live for students; 204 tells EventSource not to reconnect
+        return '', 204
+
+    slots = get_stream_slots()
+    if not slots.acquire(blocking=False):
+        response = make_response('Too many live streams', 503)
+        response.headers['Retry-After'] = '30'
+        return response
+
+    # The stream outlives the request, so each periodic check runs in its
+    # own app context instead of holding the request's connection
+    bus = get_event_bus()
+    subscription = bus.subscribe(topic)
+    teacher_id = session['user_id']
+    heartbeat = app.config['EVENTS_HEARTBEAT']
+    deadline = time.monotonic() + app.config['EVENTS_STREAM_TIMEOUT']
+    retry = app.config['EVENTS_RETRY_MS']
+    last_event_id = request.headers.get('Last-Event-ID', '')
+
+    def snapshot():
+        if role == 'admin':
+            return dashboard_totals()
+        return teacher_totals(teacher_id, date.today().isoformat())
+
+    def check(seen, force=False):
+        # Catch writes made by other workers (or dropped from a full inbox)
+        with app.app_context():
+            version = data_version()
+            if force or version != seen:
+                return version, format_event('totals', snapshot(), version)
+            return version, ''
+
+    def stream():
+        yield f'retry: {retry}\n\n'
+        seen = int(last_event_id) if last_event_id.isdigit() else None
+        seen, message = check(seen)
+        # A fresh page is current; only a reconnect may have missed changes
+        yield message if last_event_id.isdigit() else ': connected\n\n'
+        while time.monotonic() < deadline:
+            messages = subscription.get(heartbeat)
+            if subscription.overflowed:
+                subscription.overflowed = False
+                seen, message = check(seen, force=True)
+                yield message
+            elif messages:
+                for event, data in messages:
+                    seen = max(seen, data['version'])
+                    yield format_event(event, data, data['version'])
+            else:
+                seen, message = check(seen)
+                yield message or ': ping\n\n'
+
+    def close():
+        bus.unsubscribe(subscription)
+        slots.release()
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(close)
+    return response
+
 # Admin routes
 @app.route('/admin/dashboard')
 @login_required
 @admin_required
+@cached_page
 def admin_dashboard():
-    db = get_db()
-    total_students = db.execute('SELECT COUNT(*) FROM users WHERE role = "student"').fetchone()[0]
-    total_teachers = db.execute('SELECT COUNT(*) FROM users WHERE role = "teacher"').fetchone()[0]
-    total_attendance = db.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
-    
-    return render_template('dashboard_admin.html', 
-                          total_students=total_students,
-                          total_teachers=total_teachers,
-                          total_attendance=total_attendance)
+    return render_template('dashboard_admin.html', **dashboard_totals())
+
+@app.route('/admin/db-pool')
+@login_required
+@admin_required
+def admin_db_pool():
+    # Pool counters for sizing DB_POOL_SIZE
+    return jsonify(get_pool().stats())
+
+@app.route('/admin/cache')
+@login_required
+@admin_required
+def admin_cache():
+    # User/roster cache counters
+    return jsonify(get_user_cache().stats())
+
+@app.route('/admin/sessions')
+@login_required
+@admin_required
+def admin_sessions():
+    return jsonify(get_session_store().stats())
+
+@app.route('/admin/sessions/revoke/<int:user_id>', methods=['POST'])
+@login_required
+@admin_required
+def admin_revoke_sessions(user_id):
+    return jsonify({'user_id': user_id, 'revoked': revoke_sessions(user_id)})
+
+@app.route('/admin/terms')
+@login_required
+@admin_required
+def admin_terms():
+    return jsonify([dict(term) for term in partitions.list_terms(get_db())])
+
+@app.route('/admin/sections')
+@login_required
+@admin_required
+def admin_sections():
+    teachers = {}
+    for teacher in get_roster('teacher'):
+        for section in get_sections(teacher['id']):
+            teachers.setdefault(section['id'], []).append(teacher['id'])
+    return jsonify([dict(section, teachers=teachers.get(section['id'], [])) for section in get_sections()])
+
+@app.route('/admin/jobs')
+@login_required
+@admin_required
+def admin_jobs():
+    jobs = get_scheduler().state()
+    for job in jobs:
+        for field in ('next_run', 'last_started', 'last_finished'):
+            if job.get(field):
+                job[field] = datetime.fromtimestamp(job[field]).strftime('%Y-%m-%d %H:%M:%S')
+    return render_template('admin_jobs.html', jobs=jobs, scheduler=get_scheduler().stats())
+
+@app.route('/admin/jobs/<name>/run', methods=['POST'])
+@login_required
+@admin_required
+def admin_run_job(name):
+    scheduler = get_scheduler()
+    try:
+        if scheduler.started:
+            scheduler.trigger(name)
+            flash(f'Job {name} will start within {app.config["JOBS_POLL_INTERVAL"]} seconds.')
+        else:
+            # No scheduler in this worker (JOBS_ENABLED is off), so nothing would pick it up; run it here
+            result, error = scheduler.run_now(name)
+            flash(f'Job {name} failed: {error}' if error else f'Job {name} finished: {json.dumps(result, default=str)}')
+    except KeyError:
+        flash(f'Unknown job {name}.')
+    except JobBusy:
+        flash(f'Job {name} is already running.')
+    return redirect(url_for('admin_jobs'))
+
+@app.route('/admin/metrics')
+@login_required
+@admin_required
+def admin_metrics():
+    return jsonify({
+        'endpoints': get_metrics().snapshot(),
+        'db_pool': get_pool().stats(),
+        'storage': get_repository().stats(),
+        'user_cache': get_user_cache().stats(),
+        'response_cache': get_response_cache().stats(),
+        'sessions': get_session_store().stats(),
+        'password_verifier': get_password_verifier().stats(),
+        'login_limiters': {name: limiter.stats() for name, limiter in get_login_limiters().items()},
+        'checkin_queue': get_checkin_queue().stats() if 'checkin_queue' in app.extensions else None,
+        'events': get_event_bus().stats(),
+        'jobs': get_scheduler().stats(),
+        'bitmap_index': app.extensions['bitmap_index'].stats() if 'bitmap_index' in app.extensions else None,
+    })
+
+@app.route('/admin/metrics/prometheus')
+@login_required
+@admin_required
+def admin_metrics_prometheus():
+    gauges = {f'attendance_db_pool_{k}': v for k, v in get_pool().stats().items()}
+    gauges.update({f'attendance_user_cache_{k}': v for k, v in get_user_cache().stats().items()})
+    gauges.update({f'attendance_password_verifier_{k}': v for k, v in get_password_verifier().stats().items()})
+    if 'checkin_queue' in app.extensions:
+        gauges.update({f'attendance_checkin_queue_{k}': v for k, v in get_checkin_queue().stats().items()})
+    if 'bitmap_index' in app.extensions:
+        stats = app.extensions['bitmap_index'].stats()
+        gauges.update({f'attendance_bitmap_index_{k}': v for k, v in stats.items() if isinstance(v, (int, float))})
+    return Response(prometheus_text(get_metrics().snapshot(), gauges),
+                    mimetype='text/plain; version=0.0.4')
 
 @app.route('/admin/manage-students', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def manage_students():
-    db = get_db()
+    repository = get_repository()
     
     # Add new student
     if request.method == 'POST':
         name = request.form['name']
         username = request.form['username']
-        password = generate_password_hash(request.form['password'])
+        password = hash_password(request.form['password'])
         
         error = None
         if not name or not username or not request.form['password']:
             error = 'All fields are required.'
-        elif db.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone() is not None:
+        elif repository.username_taken(username):
             error = f"Username {username} is already taken."
             
         if error is None:
-            db.execute(
-                'INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)',
-                (username, password, 'student', name)
-            )
-            db.commit()
+            repository.add_user(username, password, 'student', name)
+            invalidate_users()
             flash('Student added successfully!')
             return redirect(url_for('manage_students'))
             
         flash(error)
     
     # Get list of students
-    students = db.execute('SELECT * FROM users WHERE role = "student"').fetchall()
+    students = get_roster('student')
     return render_template('manage_students.html', students=students)
 
 @app.route('/admin/manage-teachers', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def manage_teachers():
-    db = get_db()
+    repository = get_repository()
     
     # Add new teacher
     if request.method == 'POST':
         name = request.form['name']
         username = request.form['username']
-        password = generate_password_hash(request.form['password'])
+        password = hash_password(request.form['password'])
         subject = request.form['subject']
         
         error = None
         if not name or not username or not request.form['password'] or not subject:
             error = 'All fields are required.'
-        elif db.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone() is not None:
+        elif repository.username_taken(username):
             error = f"Username {username} is already taken."
             
         if error is None:
-            db.execute(
-                'INSERT INTO users (username, password, role, name, subject) VALUES (?, ?, ?, ?, ?)',
-                (username, password, 'teacher', name, subject)
-            )
-            db.commit()
+            repository.add_user(username, password, 'teacher', name, subject)
+            invalidate_users()
             flash('Teacher added successfully!')
             return redirect(url_for('manage_teachers'))
             
         flash(error)
     
     # Get list of teachers
-    teachers = db.execute('SELECT * FROM users WHERE role = "teacher"').fetchall()
+    teachers = get_roster('teacher')
     return render_template('manage_teachers.html', teachers=teachers)
 
+@app.route('/admin/import-roster', methods=['POST'])
+@login_required
+@admin_required
+def import_roster():
+    role = request.form.get('role', 'student')
+    target = 'manage_teachers' if role == 'teacher' else 'manage_students'
+    upload = request.files.get('roster')
+    if role not in roster.REQUIRED_COLUMNS or upload is None or not upload.filename:
+        flash('Please choose a CSV roster to import.')
+        return redirect(url_for(target))
+    
+    text = upload.read().decode('utf-8-sig')
+    result = roster.import_roster(get_repository(), text, role, app.config['ROSTER_IMPORT_WORKERS'],
+                                  app.config['PASSWORD_HASH_METHOD'])
+    invalidate_users()
+    flash(f"Imported {result['imported']} {role}(s) in {result['seconds']}s "
+          f"({result['rows_per_second']} rows/s), {len(result['errors'])} error(s).")
+    
+    # Render the list directly so the per-row error report can be shown
+    if role == 'teacher':
+        teachers = get_roster('teacher')
+        return render_template('manage_teachers.html', teachers=teachers, import_result=result)
+    students = get_roster('student')
+    return render_template('manage_students.html', students=students, import_result=result)
+
 @app.route('/admin/mark-attendance', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_mark_attendance():
-    db = get_db()
-    teachers = db.execute('SELECT * FROM users WHERE role = "teacher"').fetchall()
-    students = db.execute('SELECT * FROM users WHERE role = "student"').fetchall()
+    teachers = get_roster('teacher')
+    # All students unless a section is picked
+    sections = get_sections()
+    section = next((s for s in sections if str(s['id']) == request.values.get('section_id')), None)
+    students = get_section_students(section['id']) if section else get_roster('student')
     
     if request.method == 'POST':
-        teacher_id = request.form['teacher_id']
-        attendance_date = request.form['date']
-        subject = db.execute('SELECT subject FROM users WHERE id = ?', (teacher_id,)).fetchone()['subject']
+        teacher_id = parse_id(request.form.get('teacher_id', ''))
+        attendance_date = request.form.get('date', '')
+        teacher = get_user_profile(teacher_id) if teacher_id else None
         
-        # Process each student's attendance
-        for student_id in request.form.getlist('student_ids'):
-            status = 'present' if f'status_{student_id}' in request.form else 'absent'
-            notes = request.form.get(f'note_{student_id}', '')
-            
-            # Check if attendance record already exists
-            existing = db.execute(
-                'SELECT * FROM attendance WHERE student_id = ? AND date = ? AND subject = ?', 
-                (student_id, attendance_date, subject)
-            ).fetchone()
-            
-            if existing:
-                db.execute(
-                    'UPDATE attendance SET status = ?, notes = ? WHERE student_id = ? AND date = ? AND subject = ?',
-                    (status, notes, student_id, attendance_date, subject)
-                )
-            else:
-                db.execute(
-                    'INSERT INTO attendance (student_id, teacher_id, date, status, subject, notes) VALUES (?, ?, ?, ?, ?, ?)',
-                    (student_id, teacher_id, attendance_date, status, subject, notes)
-                )
-                
-        db.commit()
-        flash('Attendance recorded successfully!')
+        try:
+            if teacher is None or teacher['role'] != 'teacher':
+                raise FormError('Please choose a teacher.')
+            # Save the whole class in one batched upsert
+            rows = build_rows(request.form, teacher_id, attendance_date, teacher['subject'])
+            inserted, updated = get_repository().record_attendance(rows)
+            attendance_written(rows)
+            flash(f'Attendance recorded successfully! ({inserted} new, {updated} updated)')
+        except FormError as e:
+            flash(str(e))
+        except ArchivedTermError:
+            flash(f'{attendance_date} falls in an archived term and can no longer be changed.')
     
     today = date.today().isoformat()
-    return render_template('admin_mark_attendance.html', teachers=teachers, students=students, today=today)
+    return render_template('admin_mark_attendance.html', teachers=teachers, students=students, today=today,
+                           sections=sections, section=section)
 
 @app.route('/admin/reports')
 @login_required
@@ -288,7 +1406,7 @@ def admin_mark_attendance():
 def admin_reports():
     db = get_db()
     
-    students = db.execute('SELECT * FROM users WHERE role = "student"').fetchall()
+    students = get_roster('student')
     
     # Get attendance data if student filter is applied
     student_id = request.args.get('student_id')
@@ -296,58 +1414,90 @@ def admin_reports():
     date_to = request.args.get('date_to')
     
     attendance_data = []
+    report_summary = None
+    next_url = None
     if student_id:
-        query = '''
-            SELECT a.*, s.name as student_name, t.name as teacher_name
-            FROM attendance a
-            JOIN users s ON a.student_id = s.id
-            JOIN users t ON a.teacher_id = t.id
-            WHERE a.student_id = ?
-        '''
-        params = [student_id]
-        
-        if date_from:
-            query += ' AND a.date >= ?'
-            params.append(date_from)
-        if date_to:
-            query += ' AND a.date <= ?'
-            params.append(date_to)
-            
-        attendance_data = db.execute(query, params).fetchall()
+        filters = {'student_id': student_id, 'date_from': date_from, 'date_to': date_to}
+        report_summary = reports.summarize(db, **filters)
+        if wants_stream():
+            attendance_data = reports.attendance_history(db, **filters)
+        else:
+            attendance_data, next_cursor = reports.history_page(
+                db, get_page_size(), cursor=reports.parse_cursor(request.args.get('cursor')), **filters
+            )
+            next_url = page_url(next_cursor)
     
-    return render_template('admin_reports.html', students=students, attendance_data=attendance_data)
+    # Without a filter, show the precomputed all-student overview (lowest attendance first)
+    overview = None if student_id else get_report_snapshot()
+    if overview:
+        ranked = [row for row in overview['students'] if row['total_classes']]
+        ranked.sort(key=lambda row: (row['attendance_percent'], row['id']))
+        overview['students'] = ranked[:get_page_size()]
+    
+    return render_page('admin_reports.html', students=students, attendance_data=attendance_data,
+                       summary=report_summary, next_url=next_url, overview=overview)
+
+@app.route('/admin/analytics')
+@login_required
+@admin_required
+def admin_analytics():
+    subjects = get_repository().subjects()
+    subject = request.args.get('subject') or (subjects[0] if subjects else None)
+    return render_analytics(subject, subjects=subjects, back_url=url_for('admin_dashboard'))
+
+@app.route('/admin/reports/export')
+@login_required
+@admin_required
+def admin_reports_export():
+    if request.args.get('format', 'csv') not in exports.FORMATS:
+        flash('Unsupported export format.')
+        return redirect(url_for('admin_reports'))
+    
+    db = get_db()
+    # An empty student_id exports all students
+    rows = reports.attendance_history(
+        db,
+        student_id=request.args.get('student_id') or None,
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to'),
+        subject=request.args.get('subject')
+    )
+    columns = ('date', 'student_id', 'student_name', 'subject', 'teacher_name', 'status', 'notes')
+    return export_response(rows, columns, 'attendance-report')
 
 # Teacher routes
 @app.route('/teacher/dashboard')
 @login_required
 @teacher_required
 def teacher_dashboard():
-    db = get_db()
+    repository = get_repository()
     teacher_id = session['user_id']
-    subject = db.execute('SELECT subject FROM users WHERE id = ?', (teacher_id,)).fetchone()['subject']
+    subject = session['subject']
     
-    total_students = db.execute('SELECT COUNT(*) FROM users WHERE role = "student"').fetchone()[0]
+    enrolled = teacher_student_ids(teacher_id)
+    total_students = repository.count_users('student') if enrolled is None else len(enrolled)
     
     # Get attendance statistics
     today = date.today().isoformat()
-    today_present = db.execute(
-        'SELECT COUNT(*) FROM attendance WHERE teacher_id = ? AND date = ? AND status = "present"',
-        (teacher_id, today)
-    ).fetchone()[0]
+    today_present = teacher_totals(teacher_id, today)['today_present']
     
     return render_template('dashboard_teacher.html', 
                           subject=subject,
                           total_students=total_students,
-                          today_present=today_present)
+                          today_present=today_present,
+                          today=today)
 
 @app.route('/teacher/mark-attendance', methods=['GET', 'POST'])
 @login_required
 @teacher_required
 def teacher_mark_attendance():
-    db = get_db()
     teacher_id = session['user_id']
-    subject = db.execute('SELECT subject FROM users WHERE id = ?', (teacher_id,)).fetchone()['subject']
-    students = db.execute('SELECT * FROM users WHERE role = "student"').fetchall()
+    subject = session['subject']
+    
+    # Only the selected section's students are loaded and rendered
+    sections = get_sections(teacher_id)
+    section = select_section(sections, request.values.get('section_id'))
+    students = get_section_students(section['id']) if section else get_roster('student')
     
     # Set today's date as default
     selected_date = request.args.get('date', date.today().isoformat())
@@ -355,112 +1505,136 @@ def teacher_mark_attendance():
     # Get existing attendance data for the selected date
     attendance_data = {}
     notes_data = {}
-    existing_records = db.execute(
-        'SELECT student_id, status, notes FROM attendance WHERE teacher_id = ? AND date = ? AND subject = ?',
-        (teacher_id, selected_date, subject)
-    ).fetchall()
-    
-    for record in existing_records:
-        attendance_data[record['student_id']] = record['status']
-        notes_data[record['student_id']] = record['notes']
-    
     if request.method == 'POST':
-        attendance_date = request.form['date']
+        attendance_date = request.form.get('date', '')
         
-        # Process each student's attendance
-        for student_id in request.form.getlist('student_ids'):
-            status = 'present' if f'status_{student_id}' in request.form else 'absent'
-            notes = request.form.get(f'note_{student_id}', '')
-            
-            # Check if attendance record already exists
-            existing = db.execute(
-                'SELECT * FROM attendance WHERE student_id = ? AND date = ? AND subject = ?', 
-                (student_id, attendance_date, subject)
-            ).fetchone()
-            
-            if existing:
-                db.execute(
-                    'UPDATE attendance SET status = ?, notes = ? WHERE student_id = ? AND date = ? AND subject = ?',
-                    (status, notes, student_id, attendance_date, subject)
-                )
-            else:
-                db.execute(
-                    'INSERT INTO attendance (student_id, teacher_id, date, status, subject, notes) VALUES (?, ?, ?, ?, ?, ?)',
-                    (student_id, teacher_id, attendance_date, status, subject, notes)
-                )
-                
-        db.commit()
-        flash('Attendance recorded successfully!')
+        # Save the whole class in one batched upsert; ids outside the section are ignored
+        enrolled = {student['id'] for student in students}
+        try:
+            rows = [row for row in build_rows(request.form, teacher_id, attendance_date, subject) if row[0] in enrolled]
+            inserted, updated = get_repository().record_attendance(rows)
+            attendance_written(rows)
+            flash(f'Attendance recorded successfully! ({inserted} new, {updated} updated)')
+        except FormError as e:
+            flash(str(e))
+            return redirect(url_for('teacher_mark_attendance', section_id=section['id'] if section else None))
+        except ArchivedTermError:
+            flash(f'{attendance_date} falls in an archived term and can no longer be changed.')
         # Redirect to same page with the date parameter to show the updated records
-        return redirect(url_for('teacher_mark_attendance', date=attendance_date))
+        return redirect(url_for('teacher_mark_attendance', date=attendance_date,
+                                section_id=section['id'] if section else None))
+    
+    existing_records = get_repository().day_marks(teacher_id, selected_date, subject)
+    
+    for student_id, (status, notes) in existing_records.items():
+        attendance_data[student_id] = status
+        notes_data[student_id] = notes
     
     return render_template(
         'teacher_mark_attendance.html', 
         students=students, 
+        sections=sections,
+        section=section,
         today=selected_date, 
         subject=subject,
         attendance_data=attendance_data,
         notes_data=notes_data
     )
 
+@app.route('/teacher/attendance', methods=['POST'])
+@login_required
+@teacher_required
+def teacher_attendance_delta():
+    # JSON counterpart of the marking form: only the students whose mark changed
+    # {"date": "YYYY-MM-DD", "changes": [{"student_id": 5, "status": "absent", "notes": ""}]}
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('changes'), list):
+        return jsonify({'error': 'expected {"date": ..., "changes": [...]}'}), 400
+    try:
+        attendance_date = date.fromisoformat(payload.get('date')).isoformat()
+    except (TypeError, ValueError):
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+
+    teacher_id = session['user_id']
+    subject = session['subject']
+    students = teacher_student_ids(teacher_id)
+    if students is None:
+        students = {s['id'] for s in get_roster('student')}
+    rows = {}
+    for change in payload['changes']:
+        try:
+            student_id = int(change['student_id'])
+            status = change['status']
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'each change needs student_id and status'}), 400
+        if student_id not in students or status not in STATUSES:
+            return jsonify({'error': f'invalid change for student {student_id}'}), 400
+        rows[student_id] = (student_id, teacher_id, attendance_date, status, subject, str(change.get('notes') or ''))
+
+    try:
+        inserted, updated = get_repository().record_attendance(list(rows.values()))
+    except ArchivedTermError:
+        return jsonify({'error': f'{attendance_date} falls in an archived term and can no longer be changed'}), 409
+    attendance_written(list(rows.values()))
+    return jsonify(dict(teacher_totals(teacher_id, attendance_date), inserted=inserted, updated=updated))
+
 @app.route('/teacher/reports')
 @login_required
 @teacher_required
+@cached_page
 def teacher_reports():
     db = get_db()
     teacher_id = session['user_id']
-    subject = db.execute('SELECT subject FROM users WHERE id = ?', (teacher_id,)).fetchone()['subject']
+    subject = session['subject']
     
-    students = db.execute('SELECT * FROM users WHERE role = "student"').fetchall()
-    student_stats = []
-    
-    for student in students:
-        total_classes = db.execute(
-            'SELECT COUNT(*) FROM attendance WHERE student_id = ? AND teacher_id = ?',
-            (student['id'], teacher_id)
-        ).fetchone()[0]
-        
-        if total_classes > 0:
-            present_count = db.execute(
-                'SELECT COUNT(*) FROM attendance WHERE student_id = ? AND teacher_id = ? AND status = "present"',
-                (student['id'], teacher_id)
-            ).fetchone()[0]
-            
-            attendance_percent = round((present_count / total_classes) * 100, 2)
-        else:
-            attendance_percent = 0
-            
-        student_stats.append({
-            'id': student['id'],
-            'name': student['name'],
-            'attendance_percent': attendance_percent,
-            'total_classes': total_classes
-        })
+    # Per-student totals for this teacher's sections in one aggregate query
+    student_stats = reports.student_stats(db, teacher_id=teacher_id, sections=teacher_section_ids(teacher_id))
     
     return render_template('teacher_reports.html', student_stats=student_stats, subject=subject)
 
+@app.route('/teacher/analytics')
+@login_required
+@teacher_required
+def teacher_analytics():
+    return render_analytics(session['subject'], teacher_id=session['user_id'],
+                            back_url=url_for('teacher_dashboard'))
+
+@app.route('/teacher/reports/export')
+@login_required
+@teacher_required
+def teacher_reports_export():
+    if request.args.get('format', 'csv') not in exports.FORMATS:
+        flash('Unsupported export format.')
+        return redirect(url_for('teacher_reports'))
+    
+    db = get_db()
+    rows = reports.iter_student_stats(
+        db,
+        teacher_id=session['user_id'],
+        student_id=request.args.get('student_id') or None,
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to'),
+        subject=request.args.get('subject'),
+        sections=teacher_section_ids(session['user_id'])
+    )
+    columns = ('id', 'name', 'total_classes', 'present_count', 'absent_count', 'attendance_percent')
+    return export_response(rows, columns, 'attendance-statistics')
+
 # Student routes
 @app.route('/student/dashboard')
 @login_required
 @student_required
 def student_dashboard():
-    db = get_db()
     student_id = session['user_id']
     
-    # Get attendance summary
-    total_classes = db.execute(
-        'SELECT COUNT(*) FROM attendance WHERE student_id = ?',
-        (student_id,)
-    ).fetchone()[0]
-    
-    present_count = db.execute(
-        'SELECT COUNT(*) FROM attendance WHERE student_id = ? AND status = "present"',
-        (student_id,)
-    ).fetchone()[0]
-    
+    # Get attendance summary from the bitmap index or the materialized totals
+    index = get_bitmap_index()
+    if index is not None:
+        present_count, total_classes = index.student_totals(student_id)
+    else:
+        present_count, total_classes = get_repository().student_totals(student_id)
     absent_count = total_classes - present_count
-    
-    attendance_percent = round((present_count / total_classes) * 100, 2) if total_classes > 0 else 0
+    attendance_percent = reports.percent(present_count, total_classes)
     
     return render_template('dashboard_student.html', 
                           present_count=present_count,
@@ -470,48 +1644,59 @@ def student_dashboard():
 @app.route('/student/view-attendance')
 @login_required
 @student_required
+@cached_page
 def student_view_attendance():
     db = get_db()
     student_id = session['user_id']
     
-    attendance_records = db.execute('''
-        SELECT a.*, t.name as teacher_name, t.subject 
-        FROM attendance a
-        JOIN users t ON a.teacher_id = t.id
-        WHERE a.student_id = ?
-        ORDER BY a.date DESC
-    ''', (student_id,)).fetchall()
+    index = get_bitmap_index()
+    if index is not None:
+        present_count, total_records = index.student_totals(student_id)
+        subjects = {
+            subject: {'present': present, 'absent': total - present, 'total': total}
+            for subject, (present, total) in sorted(index.subject_totals(student_id).items())
+        }
+    else:
+        present_count, total_records = get_repository().student_totals(student_id)
+        subjects = reports.subject_stats(db, student_id)
+    
+    next_url = None
+    if wants_stream():
+        attendance_records = reports.attendance_history(db, student_id=student_id)
+    else:
+        attendance_records, next_cursor = reports.history_page(
+            db, get_page_size(), cursor=reports.parse_cursor(request.args.get('cursor')), student_id=student_id
+        )
+        next_url = page_url(next_cursor)
     
-    return render_template('student_view_attendance.html', attendance_records=attendance_records)
+    return render_page('student_view_attendance.html', attendance_records=attendance_records,
+                       total_records=total_records, subjects=subjects, next_url=next_url)
 
 # User management routes
 @app.route('/admin/edit-student/<int:student_id>', methods=['POST'])
 @login_required
 @admin_required
 def edit_student(student_id):
-    db = get_db()
+    repository = get_repository()
     
     name = request.form['name']
     username = request.form['username']
     password = request.form.get('password')
     
     # Check if username already exists for another user
-    existing_user = db.execute('SELECT id FROM users WHERE username = ? AND id != ?', 
-                               (username, student_id)).fetchone()
-    if existing_user:
+    if repository.username_taken(username, exclude_id=student_id):
         flash(f"Username {username} is already taken.")
         return redirect(url_for('manage_students'))
     
     if password and password.strip():
         # Update with new password
-        db.execute('UPDATE users SET name = ?, username = ?, password = ? WHERE id = ?',
-                  (name, username, generate_password_hash(password), student_id))
+        repository.update_user(student_id, name=name, username=username, password=hash_password(password))
     else:
         # Keep existing password
-        db.execute('UPDATE users SET name = ?, username = ? WHERE id = ?',
-                  (name, username, student_id))
+        repository.update_user(student_id, name=name, username=username)
     
-    db.commit()
+    invalidate_users(student_id)
+    revoke_sessions(student_id)
     flash('Student updated successfully!')
     return redirect(url_for('manage_students'))
 
@@ -519,15 +1704,10 @@ def edit_student(student_id):
 @login_required
 @admin_required
 def delete_student(student_id):
-    db = get_db()
-    
-    # Delete student's attendance records first (foreign key constraint)
-    db.execute('DELETE FROM attendance WHERE student_id = ?', (student_id,))
-    
-    # Then delete the student
-    db.execute('DELETE FROM users WHERE id = ?', (student_id,))
-    
-    db.commit()
+    # Deletes the student's attendance records first (foreign key constraint)
+    get_repository().delete_user(student_id)
+    invalidate_users(student_id)
+    revoke_sessions(student_id)
     flash('Student deleted successfully!')
     return redirect(url_for('manage_students'))
 
@@ -535,7 +1715,7 @@ def delete_student(student_id):
 @login_required
 @admin_required
 def edit_teacher(teacher_id):
-    db = get_db()
+    repository = get_repository()
     
     name = request.form['name']
     username = request.form['username']
@@ -543,22 +1723,20 @@ def edit_teacher(teacher_id):
     password = request.form.get('password')
     
     # Check if username already exists for another user
-    existing_user = db.execute('SELECT id FROM users WHERE username = ? AND id != ?', 
-                               (username, teacher_id)).fetchone()
-    if existing_user:
+    if repository.username_taken(username, exclude_id=teacher_id):
         flash(f"Username {username} is already taken.")
         return redirect(url_for('manage_teachers'))
     
     if password and password.strip():
         # Update with new password
-        db.execute('UPDATE users SET name = ?, username = ?, subject = ?, password = ? WHERE id = ?',
-                  (name, username, subject, generate_password_hash(password), teacher_id))
+        repository.update_user(teacher_id, name=name, username=username, subject=subject,
+                               password=hash_password(password))
     else:
         # Keep existing password
-        db.execute('UPDATE users SET name = ?, username = ?, subject = ? WHERE id = ?',
-                  (name, username, subject, teacher_id))
+        repository.update_user(teacher_id, name=name, username=username, subject=subject)
     
-    db.commit()
+    invalidate_users(teacher_id)
+    revoke_sessions(teacher_id)
     flash('Teacher updated successfully!')
     return redirect(url_for('manage_teachers'))
 
@@ -566,19 +1744,13 @@ def edit_teacher(teacher_id):
 @login_required
 @admin_required
 def delete_teacher(teacher_id):
-    db = get_db()
-    
-    # Delete teacher's attendance records first (foreign key constraint)
-    db.execute('DELETE FROM attendance WHERE teacher_id = ?', (teacher_id,))
-    
-    # Then delete the teacher
-    db.execute('DELETE FROM users WHERE id = ?', (teacher_id,))
-    
-    db.commit()
+    # Deletes the teacher's attendance records first (foreign key constraint)
+    get_repository().delete_user(teacher_id)
+    invalidate_users(teacher_id)
+    revoke_sessions(teacher_id)
     flash('Teacher deleted successfully!')
     return redirect(url_for('manage_teachers'))
 
-# Main entry point
+# Main entry point (development server; production serving goes through wsgi.py)
 if __name__ == '__main__':
-    setup_database()
-    app.run(debug=True) 
\ No newline at end of file
+    create_app().run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,77 @@
+import json
+from datetime import date
+
+UPSERT_SQL = '''
+    INSERT INTO attendance (student_id, teacher_id, date, status, subject, notes)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_id, date, subject)
+    DO UPDATE SET status = excluded.status, notes = excluded.notes
+'''
+
+EXISTING_SQL = '''
+    SELECT COUNT(*) FROM attendance
+    WHERE date = ? AND subject = ?
+      AND student_id IN (SELECT value FROM json_each(?))
+'''
+
+
+class FormError(Exception):
+    """A marking form was malformed; the message is safe to show the user."""
+
+
+def parse_id(value):
+    """A row id from form input, or None unless it is a positive integer SQLite can store."""
+    if not value.isdecimal() or len(value) > 18:
+        return None
+    return int(value) or None
+
+
+def build_rows(form, teacher_id, attendance_date, subject):
+    """Turn a marking form into attendance rows, one per student.
+
+    The form carries ``student_ids`` plus a ``status_<id>`` checkbox (present
+    when ticked) and an optional ``note_<id>`` for every student. Raises
+    ``FormError`` for a malformed date or student id.
+    """
+    try:
+        attendance_date = date.fromisoformat(attendance_date).isoformat()
+    except (TypeError, ValueError):
+        raise FormError('Please choose a valid date (YYYY-MM-DD).')
+    rows = {}
+    for value in form.getlist('student_ids'):
+        student_id = parse_id(value)
+        if student_id is None:
+            raise FormError(f'Invalid student id: {value[:20]}')
+        status = 'present' if f'status_{value}' in form else 'absent'
+        notes = form.get(f'note_{value}', '')
+        rows[student_id] = (student_id, int(teacher_id), attendance_date, status, subject, notes)
+    return list(rows.values())
+
+
+def record_attendance(db, rows):
+    """Insert or update attendance rows in one short write transaction.
+
+    Returns ``(inserted, updated)``.
+    """
+    if not rows:
+        return 0, 0
+
+    # Group student ids by (date, subject) so existing rows are counted
+    # with one indexed query per group instead of one per student
+    groups = {}
+    for student_id, _, attendance_date, _, subject, _ in rows:
+        groups.setdefault((attendance_date, subject), []).append(student_id)
+
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        updated = 0
+        for (attendance_date, subject), student_ids in groups.items():
+            updated += db.execute(
+                EXISTING_SQL, (attendance_date, subject, json.dumps(student_ids))
+            ).fetchone()[0]
+        db.executemany(UPSERT_SQL, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows) - updated, updated
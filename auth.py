@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets held in a bounded LRU map.
+
+    Each key may spend ``capacity`` attempts at once and regains
+    ``refill_per_second`` tokens per second. At most ``max_keys`` buckets
+    are kept; the least recently used bucket is dropped beyond that.
+    """
+
+    def __init__(self, capacity, refill_per_second, max_keys=10000):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def _take(self, key, cost, limited):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+            allowed = tokens >= 1
+            if allowed or not limited:
+                tokens = max(0.0, tokens - cost)
+            else:
+                self._rejected += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def allow(self, key):
+        """Spend a token if one is left; False when the key is rate limited."""
+        return self._take(key, 1, True)
+
+    def check(self, key):
+        """Like ``allow`` but without spending; pair with ``spend`` to charge only some attempts."""
+        return self._take(key, 0, True)
+
+    def spend(self, key):
+        """Charge one token after the fact (never below empty)."""
+        self._take(key, 1, False)
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._buckets), 'rejected': self._rejected}
+
+
+class PasswordVerifier:
+    """Runs password hashing on a dedicated, bounded thread pool.
+
+    hashlib releases the GIL while hashing, so the workers run in parallel.
+    At most ``workers + max_queue`` jobs may be in flight; beyond that, and
+    when a job waits longer than ``timeout`` seconds, ``VerifierBusy`` is
+    raised so the caller can shed load instead of queueing without limit.
+    """
+
+    def __init__(self, workers=4, max_queue=64, timeout=10.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def _run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise VerifierBusy('Password verification queue is full')
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._rejected += 1
+            raise VerifierBusy('Password verification timed out')
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash(self, password, method):
+        return self._run(generate_password_hash, password, method=method)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+
+_method_prefixes = {}
+
+
+def hash_prefix(method):
+    """The ``method:params`` prefix werkzeug writes for hashes made with ``method``."""
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        prefix = generate_password_hash('', method=method).split('$', 1)[0]
+        _method_prefixes[method] = prefix
+    return prefix
+
+
+def needs_rehash(password_hash, method):
+    return password_hash.split('$', 1)[0] != hash_prefix(method)
@@ -0,0 +1,102 @@
+"""Compare teacher report latency: per-student N+1 queries vs reports.student_stats().
+
+Usage:
+    python benchmarks/bench_reports.py
+    python benchmarks/bench_reports.py --students 500 2000 --days 20 60
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrations
+import reports
+
+
+def build_database(path, students, days, teachers=3):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrations.migrate(conn, os.path.join(ROOT, 'schema.sql'), os.path.join(ROOT, 'migrations'))
+
+    conn.executemany(
+        'INSERT INTO users (username, password, role, name, subject) VALUES (?, ?, ?, ?, ?)',
+        [(f'teacher{i}', 'x', 'teacher', f'Teacher {i}', f'Subject {i}') for i in range(teachers)]
+    )
+    conn.executemany(
+        'INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)',
+        [(f'student{i}', 'x', 'student', f'Student {i}') for i in range(students)]
+    )
+    teacher_ids = [r[0] for r in conn.execute('SELECT id FROM users WHERE role = "teacher"')]
+    student_ids = [r[0] for r in conn.execute('SELECT id FROM users WHERE role = "student"')]
+
+    rng = random.Random(42)
+    start = date(2025, 1, 1)
+    rows = (
+        (student_id, teacher_id, (start + timedelta(days=d)).isoformat(),
+         'present' if rng.random() < 0.8 else 'absent', f'Subject {t}', '')
+        for d in range(days)
+        for t, teacher_id in enumerate(teacher_ids)
+        for student_id in student_ids
+    )
+    conn.executemany(
+        'INSERT INTO attendance (student_id, teacher_id, date, status, subject, notes) VALUES (?, ?, ?, ?, ?, ?)',
+        rows
+    )
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn, teacher_ids[0]
+
+
+def n_plus_one(db, teacher_id):
+    # The query pattern teacher_reports used before the reports module
+    stats = []
+    for student in db.execute('SELECT * FROM users WHERE role = "student"').fetchall():
+        total = db.execute(
+            'SELECT COUNT(*) FROM attendance WHERE student_id = ? AND teacher_id = ?',
+            (student['id'], teacher_id)
+        ).fetchone()[0]
+        present = db.execute(
+            'SELECT COUNT(*) FROM attendance WHERE student_id = ? AND teacher_id = ? AND status = "present"',
+            (student['id'], teacher_id)
+        ).fetchone()[0]
+        stats.append((student['id'], total, present))
+    return stats
+
+
+def timeit(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 90])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'students':>8} {'days':>5} {'rows':>9} {'n+1 ms':>10} {'aggregate ms':>13} {'speedup':>8}")
+    for students in args.students:
+        for days in args.days:
+            with tempfile.TemporaryDirectory() as tmp:
+                db, teacher_id = build_database(os.path.join(tmp, 'bench.db'), students, days)
+                rows = db.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+                old = timeit(lambda: n_plus_one(db, teacher_id), args.repeat)
+                new = timeit(lambda: reports.student_stats(db, teacher_id=teacher_id), args.repeat)
+                db.close()
+            print(f'{students:>8} {days:>5} {rows:>9} {old:>10.1f} {new:>13.1f} {old / new:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Generate a realistic synthetic attendance database.
+
+Every teacher takes a class of ``--class-size`` students on each school day
+(weekdays) for ``--days`` days, so the attendance table holds roughly
+``teachers * days * class_size`` rows. All users share the password
+``password`` so the load test can log in as anyone.
+
+Usage:
+    python benchmarks/datagen.py bench.db --students 10000 --teachers 200 --days 400
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash
+
+import migrations
+import summary
+
+PASSWORD = 'password'
+SUBJECTS = ('Mathematics', 'Physics', 'Chemistry', 'Network & Info Security', 'Mobile App Dev',
+            'Database Systems', 'Operating Systems', 'Software Engineering', 'Web Technology', 'English')
+
+
+def school_days(start, count):
+    day = start
+    while count:
+        if day.weekday() < 5:
+            yield day.isoformat()
+            count -= 1
+        day += timedelta(days=1)
+
+
+def generate(path, students=2000, teachers=50, days=120, class_size=60, seed=42, start=date(2024, 6, 3)):
+    """Create (or replace) a database at ``path``; returns row counts."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, os.path.join(ROOT, 'schema.sql'), os.path.join(ROOT, 'migrations'))
+
+    # One cheap hash shared by every user keeps generation fast
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    conn.execute('BEGIN')
+    conn.execute(
+        'INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)',
+        ('admin', password_hash, 'admin', 'Benchmark Admin')
+    )
+    conn.executemany(
+        'INSERT INTO users (username, password, role, name, subject) VALUES (?, ?, ?, ?, ?)',
+        ((f'teacher{i}', password_hash, 'teacher', f'Teacher {i}', f'{SUBJECTS[i % len(SUBJECTS)]} {i}')
+         for i in range(teachers))
+    )
+    conn.executemany(
+        'INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)',
+        ((f'student{i}', password_hash, 'student', f'Student {i}') for i in range(students))
+    )
+    teacher_rows = conn.execute('SELECT id, subject FROM users WHERE role = "teacher" ORDER BY id').fetchall()
+    student_ids = [r[0] for r in conn.execute('SELECT id FROM users WHERE role = "student" ORDER BY id')]
+
+    # Each teacher keeps a fixed class; each student has a personal attendance rate
+    classes = {teacher_id: rng.sample(student_ids, min(class_size, len(student_ids))) for teacher_id, _ in teacher_rows}
+    rates = {student_id: rng.uniform(0.55, 0.98) for student_id in student_ids}
+    dates = list(school_days(start, days))
+
+    def rows():
+        for day in dates:
+            for teacher_id, subject in teacher_rows:
+                for student_id in classes[teacher_id]:
+                    present = rng.random() < rates[student_id]
+                    yield (student_id, teacher_id, day, 'present' if present else 'absent', subject,
+                           '' if present or rng.random() < 0.8 else 'Absent without notice')
+
+    conn.executemany(
+        'INSERT INTO attendance (student_id, teacher_id, date, status, subject, notes) VALUES (?, ?, ?, ?, ?, ?)',
+        rows()
+    )
+    conn.commit()
+    conn.row_factory = sqlite3.Row
+    summary.rebuild(conn)
+    conn.execute('ANALYZE')
+    counts = {
+        'students': students,
+        'teachers': teachers,
+        'days': len(dates),
+        'attendance': conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0],
+    }
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic attendance database.')
+    parser.add_argument('path')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--teachers', type=int, default=50)
+    parser.add_argument('--days', type=int, default=120, help='school days (weekdays) of history')
+    parser.add_argument('--class-size', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.path, args.students, args.teachers, args.days, args.class_size, args.seed)
+    print(f"Generated {counts['attendance']} attendance rows for {counts['students']} students and "
+          f"{counts['teachers']} teachers over {counts['days']} days in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""Drive the real Flask routes with concurrent virtual users and record latency percentiles.
+
+Each virtual user logs in once as a random admin, teacher or student and
+then repeats that role's scenario (dashboards, marking a class, reports,
+attendance history) until the run ends. Requests go through Flask's test
+client by default, over HTTP to a local threaded WSGI server with
+--server, or to an already running deployment (python app.py, gunicorn)
+with --url. Results are written as JSON and can be compared against a
+previous run to catch regressions before deploying.
+
+Usage:
+    python benchmarks/loadgen.py --students 2000 --users 16 --duration 30 --output results.json
+    python benchmarks/loadgen.py --database bench.db --baseline benchmarks/baseline.json
+    FLASK_DATABASE=bench.db gunicorn -c gunicorn.conf.py wsgi:app &
+    python benchmarks/loadgen.py --database bench.db --url http://127.0.0.1:8000
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+ROLE_WEIGHTS = (('student', 0.6), ('teacher', 0.3), ('admin', 0.1))
+
+
+class TestClientUser:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+
+class HttpUser:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def timed(self, user, name, method, path, data=None, expect=(200, 302)):
+        started = time.perf_counter()
+        try:
+            status = user.request(method, path, data)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[name].append(elapsed)
+            if status not in expect:
+                self.errors[name] += 1
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def summarize(samples, errors, duration):
+    def stats(values, error_count):
+        ordered = sorted(values)
+        return {
+            'requests': len(ordered),
+            'errors': error_count,
+            'rps': round(len(ordered) / duration, 2),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        }
+    steps = {name: stats(values, errors[name]) for name, values in sorted(samples.items())}
+    everything = [value for values in samples.values() for value in values]
+    return steps, stats(everything, sum(errors.values()))
+
+
+def load_fixtures(database):
+    import sqlite3
+    conn = sqlite3.connect(database)
+    users = {
+        role: [r[0] for r in conn.execute('SELECT username FROM users WHERE role = ? ORDER BY id', (role,))]
+        for role in ('admin', 'teacher', 'student')
+    }
+    student_ids = [r[0] for r in conn.execute('SELECT id FROM users WHERE role = "student" ORDER BY id')]
+    conn.close()
+    return users, student_ids
+
+
+def load_app(database):
+    import app as appmodule
+    return appmodule.create_app({'DATABASE': database})
+
+
+def virtual_user(make_user, recorder, fixtures, deadline, rng):
+    users, student_ids = fixtures
+    role = rng.choices([r for r, _ in ROLE_WEIGHTS], [w for _, w in ROLE_WEIGHTS])[0]
+    username = rng.choice(users[role])
+    user = make_user()
+    recorder.timed(user, 'POST /login', 'POST', '/login',
+                   {'username': username, 'password': datagen.PASSWORD, 'role': role}, expect=(302,))
+
+    while time.perf_counter() < deadline:
+        if role == 'student':
+            recorder.timed(user, 'GET /student/dashboard', 'GET', '/student/dashboard')
+            recorder.timed(user, 'GET /student/view-attendance', 'GET', '/student/view-attendance')
+        elif role == 'teacher':
+            recorder.timed(user, 'GET /teacher/dashboard', 'GET', '/teacher/dashboard')
+            recorder.timed(user, 'GET /teacher/mark-attendance', 'GET', '/teacher/mark-attendance')
+            form = {'date': date.today().isoformat(), 'student_ids': [str(i) for i in student_ids]}
+            for student_id in student_ids:
+                if rng.random() < 0.85:
+                    form[f'status_{student_id}'] = 'on'
+            recorder.timed(user, 'POST /teacher/mark-attendance', 'POST', '/teacher/mark-attendance', form)
+            recorder.timed(user, 'GET /teacher/reports', 'GET', '/teacher/reports')
+        else:
+            student_id = rng.choice(student_ids)
+            recorder.timed(user, 'GET /admin/dashboard', 'GET', '/admin/dashboard')
+            recorder.timed(user, 'GET /admin/reports', 'GET', f'/admin/reports?student_id={student_id}')
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions (p95 slower than baseline by more than ``tolerance``)."""
+    regressions = []
+    for name, current in results['steps'].items():
+        previous = baseline.get('steps', {}).get(name)
+        if previous and previous['p95_ms'] > 0 and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {previous['p95_ms']}ms")
+        if previous is not None and current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {previous['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the attendance app.')
+    parser.add_argument('--database', help='existing database (default: generate a temporary one)')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--teachers', type=int, default=50)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds')
+    parser.add_argument('--server', action='store_true', help='serve over HTTP with a threaded WSGI server')
+    parser.add_argument('--url', help='base URL of a running server using --database')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', help='compare against a previous results JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    if args.url and not args.database:
+        parser.error('--url needs the --database the server is using')
+
+    tmp = None
+    database = args.database
+    dataset = {'database': database}
+    if database is None:
+        tmp = tempfile.TemporaryDirectory()
+        database = os.path.join(tmp.name, 'bench.db')
+        dataset = datagen.generate(database, args.students, args.teachers, args.days)
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        make_user = lambda: HttpUser(base_url)
+    elif args.server:
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        app = load_app(database)
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        make_user = lambda: HttpUser(base_url)
+    else:
+        app = load_app(database)
+        make_user = lambda: TestClientUser(app)
+
+    fixtures = load_fixtures(database)
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=virtual_user,
+                         args=(make_user, recorder, fixtures, deadline, random.Random(args.seed + i)))
+        for i in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    if server is not None:
+        server.shutdown()
+
+    steps, total = summarize(recorder.samples, recorder.errors, duration)
+    results = {
+        'meta': {
+            'dataset': dataset,
+            'users': args.users,
+            'duration_s': round(duration, 2),
+            'transport': args.url or ('http' if args.server else 'test_client'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'total': total,
+        'steps': steps,
+    }
+
+    print(f"{'step':<34} {'req':>6} {'err':>4} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, s in list(steps.items()) + [('TOTAL', total)]:
+        print(f"{name:<34} {s['requests']:>6} {s['errors']:>4} {s['rps']:>8} "
+              f"{s['p50_ms']:>8}ms {s['p95_ms']:>8}ms {s['p99_ms']:>8}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        status = 1 if regressions else 0
+
+    if tmp is not None:
+        tmp.cleanup()
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import sys
+import threading
+import time
+from datetime import date
+
+import partitions
+
+
+def _set_bit(bits, index, value):
+    byte, mask = index >> 3, 1 << (index & 7)
+    if byte >= len(bits):
+        # Grow in blocks so day-by-day appends do not reallocate every time
+        bits.extend(bytes(byte - len(bits) + 8))
+    if value:
+        bits[byte] |= mask
+    else:
+        bits[byte] &= ~mask & 0xFF
+
+
+def _get_bit(bits, index):
+    byte = index >> 3
+    return byte < len(bits) and bits[byte] >> (index & 7) & 1
+
+
+def _count(bits):
+    return int.from_bytes(bits, 'little').bit_count()
+
+
+class AttendanceBitmaps:
+    """Live and archived attendance held as bitsets, for popcount-speed lookups.
+
+    Every (subject, student) pair has a ``marked`` and a ``present`` bitset
+    with one bit per day since ``origin``, and every (day, subject, teacher)
+    has the same pair with one bit per student id, so per-student totals
+    match ``attendance_summary`` and per-teacher day totals match
+    ``attendance_daily``. There is one ``bytearray`` per bitset and no
+    per-row Python object; since ``(student_id, date, subject)`` is unique
+    in the attendance tables, a bit is exactly one row.
+
+    ``version`` is the ``attendance`` data version the bitsets reflect.
+    Writes applied with ``apply`` advance it by one per row, matching the
+    per-row triggers, so a different version in the database means another
+    process wrote and the index must be rebuilt.
+    """
+
+    def __init__(self, origin, version=0):
+        self.origin = origin
+        self.version = version
+        self.stale = False
+        self.checked_at = None
+        self.behind_since = None
+        self.build_ms = 0.0
+        self._students = {}
+        self._days = {}
+        self._dates = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, db):
+        """Load every attendance row from one consistent read snapshot."""
+        started = time.perf_counter()
+        db.execute('BEGIN')
+        try:
+            version = db.execute("SELECT version FROM data_versions WHERE name = 'attendance'").fetchone()[0]
+            first = db.execute(f'SELECT MIN(date) FROM ({partitions.ALL_ROWS})').fetchone()[0]
+            index = cls(date.fromisoformat(first).toordinal() if first else date.today().toordinal(), version)
+            for student_id, teacher_id, day, status, subject in db.execute(
+                f'SELECT student_id, teacher_id, date, status, subject FROM ({partitions.ALL_ROWS})'
+            ):
+                index._set(student_id, teacher_id, index._day(day), status == 'present', subject)
+        finally:
+            db.commit()
+        index.build_ms = round((time.perf_counter() - started) * 1000, 3)
+        return index
+
+    def _day(self, day):
+        offset = self._dates.get(day)
+        if offset is None:
+            offset = self._dates[day] = date.fromisoformat(day).toordinal() - self.origin
+        return offset
+
+    def _set(self, student_id, teacher_id, offset, present, subject):
+        marked_bits, present_bits = self._students.setdefault(student_id, {}).setdefault(
+            subject, (bytearray(), bytearray())
+        )
+        _set_bit(marked_bits, offset, True)
+        _set_bit(present_bits, offset, present)
+        teachers = self._days.setdefault(offset, {}).setdefault(subject, {})
+        for owner, (marked_bits, _) in teachers.items():
+            if _get_bit(marked_bits, student_id):
+                # Re-marking keeps the row's original teacher, as the upsert does
+                teacher_id = owner
+                break
+        marked_bits, present_bits = teachers.setdefault(teacher_id, (bytearray(), bytearray()))
+        _set_bit(marked_bits, student_id, True)
+        _set_bit(present_bits, student_id, present)
+
+    def apply(self, rows):
+        """Record attendance row tuples that were just written."""
+        with self._lock:
+            for student_id, teacher_id, day, status, subject, _ in rows:
+                offset = self._day(day)
+                if offset < 0:
+                    # Before the first indexed day; only a rebuild can move the origin
+                    self.stale = True
+                    continue
+                self._set(student_id, teacher_id, offset, status == 'present', subject)
+            self.version += len(rows)
+
+    # Per student
+    def student_totals(self, student_id):
+        """``(present, total)`` over every subject."""
+        with self._lock:
+            subjects = self._students.get(student_id, {}).values()
+            return sum(_count(p) for _, p in subjects), sum(_count(m) for m, _ in subjects)
+
+    def subject_totals(self, student_id):
+        with self._lock:
+            return {subject: (_count(p), _count(m)) for subject, (m, p) in self._students.get(student_id, {}).items()}
+
+    # Per day
+    def day_totals(self, teacher_id, day):
+        """``(present, total)`` marks one teacher made on one day, over all subjects."""
+        with self._lock:
+            subjects = self._days.get(date.fromisoformat(day).toordinal() - self.origin, {}).values()
+            pairs = [teachers[teacher_id] for teachers in subjects if teacher_id in teachers]
+            return sum(_count(p) for _, p in pairs), sum(_count(m) for m, _ in pairs)
+
+    def stats(self):
+        with self._lock:
+            bitsets = [bits for subjects in self._students.values() for pair in subjects.values() for bits in pair]
+            day_subjects = [teachers for subjects in self._days.values() for teachers in subjects.values()]
+            bitsets += [bits for teachers in day_subjects for pair in teachers.values() for bits in pair]
+            containers = sum(sys.getsizeof(container) for container in (
+                self._students, self._days, *self._students.values(), *self._days.values(), *day_subjects
+            ))
+            return {
+                'version': self.version,
+                'stale': self.stale,
+                'origin': date.fromordinal(self.origin).isoformat(),
+                'students': len(self._students),
+                'bitsets': len(bitsets),
+                'bitset_bytes': sum(len(bits) for bits in bitsets),
+                'memory_bytes': containers + sum(sys.getsizeof(bits) for bits in bitsets),
+                'build_ms': self.build_ms,
+            }
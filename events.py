@@ -0,0 +1,91 @@
+import json
+import threading
+from collections import deque
+
+
+def format_event(event, data, event_id=None):
+    """One Server-Sent Events message with a JSON payload."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """A subscriber's bounded inbox of ``(event, data)`` pairs.
+
+    When a slow client lets ``max_queue`` messages pile up the oldest are
+    dropped and ``overflowed`` is set, so the stream can send a fresh
+    snapshot instead.
+    """
+
+    def __init__(self, topics, max_queue):
+        self.topics = frozenset(topics)
+        self.overflowed = False
+        self._messages = deque(maxlen=max_queue)
+        self._cond = threading.Condition()
+
+    def put(self, event, data):
+        with self._cond:
+            if len(self._messages) == self._messages.maxlen:
+                self.overflowed = True
+            self._messages.append((event, data))
+            self._cond.notify()
+
+    def get(self, timeout):
+        """Wait up to ``timeout`` seconds; returns all queued messages (maybe none)."""
+        with self._cond:
+            if not self._messages:
+                self._cond.wait(timeout)
+            messages = list(self._messages)
+            self._messages.clear()
+            return messages
+
+
+class EventBus:
+    """In-process publish/subscribe for live page updates.
+
+    Publishers never block: each subscriber has its own bounded inbox.
+    Only subscribers in this process are reached; other worker processes
+    notice changes through the ``data_versions`` table instead.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, *topics):
+        subscription = Subscription(topics, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def listening(self, topic):
+        with self._lock:
+            return any(topic in s.topics for s in self._subscribers)
+
+    def publish(self, topic, event, data):
+        with self._lock:
+            targets = [s for s in self._subscribers if topic in s.topics]
+            self.published += 1
+            self.delivered += len(targets)
+        for subscription in targets:
+            subscription.put(event, data)
+        return len(targets)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'delivered': self.delivered,
+            }
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    # CSV with a UTF-8 byte order mark so Excel detects the encoding
+    'excel': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+CHUNK_ROWS = 500
+
+
+def iter_csv(rows, columns, bom=False, chunk_rows=CHUNK_ROWS):
+    """Yield CSV text in chunks of ``chunk_rows`` rows.
+
+    ``rows`` may be any iterable of mappings (e.g. an open sqlite3 cursor),
+    so only one chunk is ever held in memory.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if bom:
+        buffer.write('\ufeff')
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([row[column] for column in columns])
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(rows, columns, chunk_rows=CHUNK_ROWS):
+    """Yield one JSON object per line, in chunks of ``chunk_rows`` rows."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: row[column] for column in columns}))
+        if len(lines) >= chunk_rows:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_export(rows, columns, fmt):
+    if fmt == 'ndjson':
+        return iter_ndjson(rows, columns)
+    return iter_csv(rows, columns, bom=(fmt == 'excel'))
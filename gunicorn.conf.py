@@ -0,0 +1,22 @@
+"""Gunicorn settings; see "Production Deployment" in the README for the worker model."""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# A few processes, each with a pool of threads: SQLite and password hashing
+# release the GIL, and every process keeps its own connection pool and caches
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count(), 4)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))  # keep <= FLASK_DB_POOL_SIZE
+
+# Load the app after forking so no worker inherits another process's SQLite
+# connections or background threads
+preload_app = False
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+max_requests = 10000
+max_requests_jitter = 500
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
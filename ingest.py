@@ -0,0 +1,295 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+
+STATUSES = ('present', 'absent')
+
+
+class QueueFull(Exception):
+    pass
+
+
+def parse_events(payload, students, teachers, today=None, closed=()):
+    """Validate check-in events posted by a kiosk.
+
+    ``payload`` is a single event object, a list of events or
+    ``{"events": [...]}``. ``students`` is the set of valid student ids and
+    ``teachers`` maps teacher id to subject. Each event needs ``student_id``
+    and ``teacher_id``; ``status`` defaults to present, ``date`` to today
+    (an ISO ``timestamp`` is accepted instead) and ``subject`` to the
+    teacher's subject. Events dated inside one of the ``closed``
+    ``(start, end)`` ranges (archived terms) are rejected.
+
+    Returns ``(rows, errors)`` where rows are attendance tuples and errors
+    are ``{"index", "error"}`` dicts for rejected events.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('events', [payload])
+    if not isinstance(payload, list):
+        return [], [{'index': None, 'error': 'expected an event object or a list of events'}]
+
+    today = today or date.today().isoformat()
+    rows = []
+    errors = []
+    for index, event in enumerate(payload):
+        if not isinstance(event, dict):
+            errors.append({'index': index, 'error': 'event must be an object'})
+            continue
+        try:
+            student_id = int(event['student_id'])
+            teacher_id = int(event['teacher_id'])
+        except (KeyError, TypeError, ValueError):
+            errors.append({'index': index, 'error': 'student_id and teacher_id are required integers'})
+            continue
+        if student_id not in students:
+            errors.append({'index': index, 'error': f'unknown student {student_id}'})
+            continue
+        if teacher_id not in teachers:
+            errors.append({'index': index, 'error': f'unknown teacher {teacher_id}'})
+            continue
+
+        status = event.get('status', 'present')
+        if status not in STATUSES:
+            errors.append({'index': index, 'error': f'status must be one of {", ".join(STATUSES)}'})
+            continue
+        try:
+            if 'date' in event:
+                day = date.fromisoformat(event['date']).isoformat()
+            elif 'timestamp' in event:
+                day = datetime.fromisoformat(event['timestamp']).date().isoformat()
+            else:
+                day = today
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'date must be YYYY-MM-DD'})
+            continue
+        if any(start <= day <= end for start, end in closed):
+            errors.append({'index': index, 'error': f'{day} falls in an archived term'})
+            continue
+
+        subject = event.get('subject') or teachers[teacher_id]
+        notes = event.get('notes') or ''
+        rows.append((student_id, teacher_id, day, status, str(subject), str(notes)))
+    return rows, errors
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class CheckinQueue:
+    """Write-behind queue for kiosk/RFID check-ins.
+
+    Submitted rows are coalesced by ``(student_id, date, subject)`` (the
+    latest event wins) and handed to ``writer`` in batches from a background
+    thread once ``flush_size`` rows are pending or ``flush_interval`` seconds
+    have passed. ``writer`` receives a list of attendance row tuples and must
+    write them in one transaction.
+
+    With ``spool_dir`` set, every accepted event is first appended to a
+    per-process spool file, which is rotated at each flush and deleted once
+    the batch is committed. A batch that fails goes back to the queue and
+    keeps its spool file until a later flush commits it. Spool files left
+    behind by a process that is no longer running are replayed on start,
+    oldest first, so queued events survive a crash.
+    """
+
+    def __init__(self, writer, flush_size=500, flush_interval=1.0, max_pending=50000,
+                 spool_dir=None, fsync=False):
+        self.writer = writer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spool_dir = spool_dir
+        self.fsync = fsync
+
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._spool = None
+        self._spool_path = None
+        self._generation = 0
+        self._requeued_files = []
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+    # Spool handling
+    def _open_spool(self):
+        if self.spool_dir is None:
+            return
+        self._spool_path = os.path.join(self.spool_dir, f'checkins-{os.getpid()}.jsonl')
+        self._spool = open(self._spool_path, 'a', encoding='utf-8')
+
+    def _rotate_spool(self):
+        # Called with the lock held; returns the file holding the batch being flushed
+        if self._spool is None:
+            return None
+        self._spool.close()
+        self._generation += 1
+        flushing = f'{self._spool_path}.{self._generation}.flushing'
+        os.replace(self._spool_path, flushing)
+        self._spool = open(self._spool_path, 'a', encoding='utf-8')
+        return flushing
+
+    def _replay_orphans(self):
+        if self.spool_dir is None:
+            return []
+        os.makedirs(self.spool_dir, exist_ok=True)
+        orphans = []
+        for path in glob.glob(os.path.join(self.spool_dir, 'checkins-*.jsonl*')):
+            try:
+                pid, _, rest = os.path.basename(path).split('-', 1)[1].partition('.jsonl')
+                pid = int(pid)
+                # checkins-PID.jsonl.N.flushing are rotated batches, the bare file the newest events
+                generation = int(rest.split('.')[1]) if rest else float('inf')
+            except (ValueError, IndexError):
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            if pid == os.getpid() and generation != float('inf'):
+                # An earlier process with this pid; rotate past its files, not over them
+                self._generation = max(self._generation, generation)
+            orphans.append((os.path.getmtime(path), generation, pid, path))
+        replayed = []
+        # Oldest first, so the newest event for a key wins
+        for _, generation, pid, path in sorted(orphans):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._add(tuple(json.loads(line)))
+                    except (ValueError, TypeError):
+                        logger.warning('Skipping corrupt spool line in %s', path)
+            if pid == os.getpid() and generation == float('inf'):
+                # This process's own spool file is reopened for new events,
+                # so its replayed rows move to a rotated file
+                self._generation += 1
+                rotated = f'{path}.{self._generation}.flushing'
+                os.replace(path, rotated)
+                path = rotated
+            replayed.append(path)
+        return replayed
+
+    # Queue
+    def _add(self, row):
+        key = (row[0], row[2], row[4])
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = row
+
+    def submit(self, rows):
+        """Queue attendance row tuples; raises ``QueueFull`` when saturated."""
+        with self._cond:
+            if len(self._pending) + len(rows) > self.max_pending:
+                raise QueueFull('Check-in queue is full')
+            if self._spool is not None:
+                self._spool.write(''.join(json.dumps(row) + '\n' for row in rows))
+                self._spool.flush()
+                if self.fsync:
+                    os.fsync(self._spool.fileno())
+            for row in rows:
+                self._add(row)
+            self.submitted += len(rows)
+            if len(self._pending) >= self.flush_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Write everything pending now; returns the number of rows written."""
+        with self._cond:
+            if not self._pending:
+                return 0
+            batch = list(self._pending.values())
+            self._pending = {}
+            flushing = self._rotate_spool()
+            # Files of earlier failed batches hold rows that are in this one
+            spool_files = self._requeued_files + ([flushing] if flushing else [])
+            self._requeued_files = []
+        return self._write(batch, spool_files)
+
+    def _write(self, batch, spool_files):
+        started = time.perf_counter()
+        try:
+            self.writer(batch)
+        except Exception:
+            logger.exception('Check-in flush of %d rows failed; requeueing', len(batch))
+            with self._cond:
+                self.failures += 1
+                # Keep newer events that arrived meanwhile
+                for row in batch:
+                    self._pending.setdefault((row[0], row[2], row[4]), row)
+                # The rows are only durable in their spool files until a flush commits them
+                self._requeued_files = spool_files + self._requeued_files
+            return 0
+        for path in spool_files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._cond:
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def start(self):
+        orphans = self._replay_orphans()
+        self._open_spool()
+        if orphans:
+            logger.info('Replaying %d spooled check-in(s) from %d file(s)', len(self._pending), len(orphans))
+            with self._cond:
+                batch = list(self._pending.values())
+                self._pending = {}
+            self._write(batch, orphans)
+        self._thread = threading.Thread(target=self._run, name='checkin-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._spool is not None:
+            self._spool.close()
+            if os.path.exists(self._spool_path) and os.path.getsize(self._spool_path) == 0:
+                os.remove(self._spool_path)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'flushes': self.flushes,
+                'flushed_rows': self.flushed_rows,
+                'failures': self.failures,
+                'last_flush_ms': self.last_flush_ms,
+            }
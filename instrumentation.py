@@ -0,0 +1,157 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Stats for the request being handled on this thread (None outside requests)
+current_request = ContextVar('current_request', default=None)
+
+# Slow statements are logged when they take longer than this many seconds
+SLOW_QUERY_SECONDS = 0.1
+
+
+class RequestStats:
+    __slots__ = ('started', 'query_count', 'sql_time', 'render_time', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+
+    def record_query(self, sql, elapsed):
+        self.query_count += 1
+        self.sql_time += elapsed
+        self.statements[sql] += 1
+
+
+def _record(sql, started):
+    elapsed = time.perf_counter() - started
+    stats = current_request.get()
+    if stats is not None:
+        stats.record_query(sql, elapsed)
+    if elapsed > SLOW_QUERY_SECONDS:
+        logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, ' '.join(sql.split()))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that times every statement for the current request."""
+
+    def execute(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            _record(sql, started)
+
+    def executemany(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            _record(sql, started)
+
+    def executescript(self, sql):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql)
+        finally:
+            _record(sql, started)
+
+
+class EndpointMetrics:
+    __slots__ = ('requests', 'errors', 'queries', 'sql_time', 'render_time', 'n_plus_one', 'latencies')
+
+    def __init__(self, window):
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.n_plus_one = 0
+        self.latencies = deque(maxlen=window)
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MetricsRegistry:
+    """Per-endpoint request counters and a rolling window of latencies."""
+
+    def __init__(self, window=1024, n_plus_one_threshold=20):
+        self.window = window
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, stats, elapsed, error=False):
+        repeated = [sql for sql, count in stats.statements.items() if count > self.n_plus_one_threshold]
+        for sql in repeated:
+            logger.warning('Possible N+1 in %s: statement ran %d times: %s',
+                           endpoint, stats.statements[sql], ' '.join(sql.split()))
+        with self._lock:
+            metrics = self._endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self._endpoints[endpoint] = EndpointMetrics(self.window)
+            metrics.requests += 1
+            metrics.errors += int(error)
+            metrics.queries += stats.query_count
+            metrics.sql_time += stats.sql_time
+            metrics.render_time += stats.render_time
+            metrics.n_plus_one += int(bool(repeated))
+            metrics.latencies.append(elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            items = [(name, m, sorted(m.latencies)) for name, m in self._endpoints.items()]
+        result = {}
+        for name, m, ordered in items:
+            result[name] = {
+                'requests': m.requests,
+                'errors': m.errors,
+                'queries_per_request': round(m.queries / m.requests, 2),
+                'sql_ms_per_request': round(m.sql_time * 1000 / m.requests, 3),
+                'render_ms_per_request': round(m.render_time * 1000 / m.requests, 3),
+                'n_plus_one_requests': m.n_plus_one,
+                'p50_ms': round(_percentile(ordered, 0.50) * 1000, 3),
+                'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+                'p99_ms': round(_percentile(ordered, 0.99) * 1000, 3),
+            }
+        return result
+
+
+def prometheus_text(snapshot, gauges=None):
+    """Render a metrics snapshot in the Prometheus text exposition format."""
+    lines = []
+    series = (
+        ('attendance_http_requests_total', 'counter', 'requests', 'Requests handled.'),
+        ('attendance_http_errors_total', 'counter', 'errors', 'Requests that returned 5xx or raised.'),
+        ('attendance_sql_queries_per_request', 'gauge', 'queries_per_request', 'Mean SQL statements per request.'),
+        ('attendance_sql_ms_per_request', 'gauge', 'sql_ms_per_request', 'Mean SQL time per request.'),
+        ('attendance_render_ms_per_request', 'gauge', 'render_ms_per_request', 'Mean template render time.'),
+        ('attendance_n_plus_one_requests_total', 'counter', 'n_plus_one_requests', 'Requests flagged as N+1.'),
+    )
+    for metric, kind, key, help_text in series:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for endpoint, values in sorted(snapshot.items()):
+            lines.append(f'{metric}{{endpoint="{endpoint}"}} {values[key]}')
+
+    lines.append('# HELP attendance_request_latency_ms Rolling request latency percentiles.')
+    lines.append('# TYPE attendance_request_latency_ms summary')
+    for endpoint, values in sorted(snapshot.items()):
+        for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+            lines.append(f'attendance_request_latency_ms{{endpoint="{endpoint}",quantile="{quantile}"}} {values[key]}')
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
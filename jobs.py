@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class JobBusy(Exception):
+    """The job is already running, in this process or another."""
+
+
+class Job:
+    """A recurring job: every ``every`` seconds, or daily at ``at`` ("HH:MM", local time).
+
+    ``func`` takes no arguments; whatever it returns (JSON-serializable) is
+    kept as the job's last result.
+    """
+
+    def __init__(self, name, func, every=None, at=None, description=''):
+        if (every is None) == (at is None):
+            raise ValueError(f'Job {name} needs exactly one of every= or at=')
+        self.name = name
+        self.func = func
+        self.every = every
+        self.at = None if at is None else datetime.strptime(at, '%H:%M').time()
+        self.description = description
+
+    @property
+    def schedule(self):
+        return f'every {self.every}s' if self.every is not None else f"daily at {self.at.strftime('%H:%M')}"
+
+    def next_run(self, after):
+        """Epoch seconds of the first run strictly after ``after``."""
+        if self.every is not None:
+            return int(after + self.every)
+        moment = datetime.fromtimestamp(after)
+        run = datetime.combine(moment.date(), self.at)
+        if run <= moment:
+            run += timedelta(days=1)
+        return int(run.timestamp())
+
+
+class JobScheduler:
+    """Runs recurring jobs on a small thread pool, with their state in the ``jobs`` table.
+
+    ``connect`` returns the connection to use and ``context`` returns a
+    context manager each tick and job runs inside (the app context). A run
+    is claimed with a conditional UPDATE before it starts, so when every
+    worker process runs a scheduler each due job still runs only once. A
+    run that is still marked running after ``stale_after`` seconds (its
+    process died) may be claimed again.
+    """
+
+    def __init__(self, connect, context, workers=2, poll_interval=30.0, stale_after=3600):
+        self.connect = connect
+        self.context = context
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.owner = f'{os.getpid()}-{id(self):x}'
+
+        self._jobs = {}
+        self._running = set()
+        self._cond = threading.Condition()
+        self._pool = None
+        self._thread = None
+        self._stopping = False
+        self.ticks = 0
+
+    def add(self, job):
+        self._jobs[job.name] = job
+        return job
+
+    @property
+    def jobs(self):
+        return list(self._jobs.values())
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def register(self):
+        """Create state rows for new jobs; existing rows keep their schedule and history.
+
+        New interval jobs are due at once, daily jobs at their next time.
+        """
+        now = time.time()
+        db = self.connect()
+        db.executemany(
+            'INSERT OR IGNORE INTO jobs (name, next_run) VALUES (?, ?)',
+            [(job.name, now if job.every is not None else job.next_run(now)) for job in self._jobs.values()]
+        )
+        db.commit()
+
+    def _claim(self, job, now, due=True):
+        # due=False claims the job even before its next run (a manual run)
+        db = self.connect()
+        claimed = db.execute(
+            '''
+            UPDATE jobs SET status = 'running', owner = ?, last_started = ?, next_run = ?
+            WHERE name = ? AND (next_run <= ? OR NOT ?) AND (status != 'running' OR last_started < ?)
+            ''',
+            (self.owner, now, job.next_run(now), job.name, now, due, now - self.stale_after)
+        ).rowcount
+        db.commit()
+        return claimed == 1
+
+    def run(self, job):
+        """Run ``job`` now in this thread and record the outcome."""
+        with self._cond:
+            self._running.add(job.name)
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            with self.context():
+                result = job.func()
+        except Exception as e:
+            logger.exception('Job %s failed', job.name)
+            error = f'{type(e).__name__}: {e}'
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        try:
+            with self.context():
+                db = self.connect()
+                db.execute(
+                    '''
+                    UPDATE jobs SET status = ?, owner = NULL, last_finished = ?, last_duration_ms = ?,
+                                    last_error = ?, last_result = ?, runs = runs + 1,
+                                    failures = failures + ?
+                    WHERE name = ?
+                    ''',
+                    ('failed' if error else 'ok', time.time(), duration_ms, error,
+                     None if error else json.dumps(result, default=str), 1 if error else 0, job.name)
+                )
+                db.commit()
+        finally:
+            with self._cond:
+                self._running.discard(job.name)
+        return result, error
+
+    def tick(self):
+        """Start every due job this process can claim; returns their names."""
+        started = []
+        now = time.time()
+        with self.context():
+            for job in self._jobs.values():
+                with self._cond:
+                    if job.name in self._running:
+                        continue
+                if self._claim(job, now):
+                    started.append(job.name)
+        for name in started:
+            self._pool.submit(self.run, self._jobs[name])
+        with self._cond:
+            self.ticks += 1
+        return started
+
+    def run_now(self, name):
+        """Claim a job and run it in this thread; returns ``(result, error)``.
+
+        Raises ``KeyError`` for an unknown job and ``JobBusy`` when it is
+        already running. The next scheduled run moves on as after any run.
+        """
+        job = self._jobs[name]
+        with self.context():
+            self.register()
+            claimed = job.name not in self._running and self._claim(job, time.time(), due=False)
+        if not claimed:
+            raise JobBusy(name)
+        return self.run(job)
+
+    def trigger(self, name):
+        """Make a job due now; whichever worker ticks first runs it."""
+        if name not in self._jobs:
+            raise KeyError(name)
+        db = self.connect()
+        db.execute('UPDATE jobs SET next_run = 0 WHERE name = ?', (name,))
+        db.commit()
+        with self._cond:
+            self._cond.notify()
+
+    def state(self):
+        """Persisted state of every registered job, in registration order."""
+        rows = {row['name']: dict(row) for row in self.connect().execute('SELECT * FROM jobs')}
+        return [
+            dict(rows.get(job.name, {'name': job.name}), schedule=job.schedule, description=job.description)
+            for job in self._jobs.values()
+        ]
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.poll_interval)
+                if self._stopping:
+                    return
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('Job scheduler tick failed')
+
+    def start(self):
+        with self.context():
+            self.register()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        self._thread = threading.Thread(target=self._loop, name='job-scheduler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            # A job cut short stays 'running' until stale_after lets another worker retry it
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'jobs': len(self._jobs),
+                'started': self.started,
+                'running': sorted(self._running),
+                'ticks': self.ticks,
+                'workers': self.workers,
+            }
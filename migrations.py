@@ -0,0 +1,59 @@
+import os
+import re
+
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+class MigrationError(Exception):
+    pass
+
+
+def discover(schema_path, migrations_dir):
+    """Return ``(version, name, path)`` for every known migration, in order.
+
+    ``schema.sql`` is always version 1; files in ``migrations_dir`` named
+    ``NNNN_description.sql`` provide the versions after it.
+    """
+    migrations = [(1, 'baseline', schema_path)]
+    if os.path.isdir(migrations_dir):
+        for filename in sorted(os.listdir(migrations_dir)):
+            match = MIGRATION_FILE.match(filename)
+            if match is None:
+                continue
+            version = int(match.group(1))
+            if version <= migrations[-1][0]:
+                raise MigrationError(f'Duplicate or out of order migration: {filename}')
+            migrations.append((version, match.group(2), os.path.join(migrations_dir, filename)))
+    return migrations
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def pending(conn, schema_path, migrations_dir):
+    version = current_version(conn)
+    return [m for m in discover(schema_path, migrations_dir) if m[0] > version]
+
+
+def migrate(conn, schema_path, migrations_dir, target=None):
+    """Apply pending migrations, each in its own transaction.
+
+    The schema version is tracked in ``PRAGMA user_version`` and bumped in
+    the same transaction as the migration, so an interrupted run can simply
+    be restarted. Existing data is never dropped.
+    """
+    applied = []
+    for version, name, path in pending(conn, schema_path, migrations_dir):
+        if target is not None and version > target:
+            break
+        with open(path, 'r') as f:
+            sql = f.read()
+        try:
+            conn.executescript(f'BEGIN;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            raise MigrationError(f'Migration {version} ({name}) failed: {e}') from e
+        applied.append((version, name))
+    return applied
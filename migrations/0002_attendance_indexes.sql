@@ -0,0 +1,30 @@
+-- Keep only the latest row for each (student_id, date, subject) so the
+-- natural key can be enforced on databases created before this migration.
+DELETE FROM attendance
+WHERE id NOT IN (
+    SELECT MAX(id) FROM attendance GROUP BY student_id, date, subject
+);
+
+-- Natural key; also serves per-student lookups and date ranges
+CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_student_date_subject
+    ON attendance (student_id, date, subject);
+
+-- Per-student present/total counts (dashboards)
+CREATE INDEX IF NOT EXISTS ix_attendance_student_status
+    ON attendance (student_id, status);
+
+-- Teacher's marking sheet and today's present count
+CREATE INDEX IF NOT EXISTS ix_attendance_teacher_date
+    ON attendance (teacher_id, date, subject, status);
+
+-- Per-student statistics for a teacher
+CREATE INDEX IF NOT EXISTS ix_attendance_teacher_student
+    ON attendance (teacher_id, student_id, status);
+
+-- Date range reports across all students
+CREATE INDEX IF NOT EXISTS ix_attendance_date
+    ON attendance (date);
+
+-- Role rosters (student/teacher lists and counts)
+CREATE INDEX IF NOT EXISTS ix_users_role
+    ON users (role, name);
@@ -0,0 +1,90 @@
+-- Materialized per-(student, teacher, subject) totals for dashboards.
+-- Kept current by the triggers below, which run inside the same
+-- transaction as the attendance write that fires them.
+CREATE TABLE IF NOT EXISTS attendance_summary (
+    student_id INTEGER NOT NULL,
+    teacher_id INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    present INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (student_id, teacher_id, subject)
+) WITHOUT ROWID;
+
+-- Per-teacher, per-day totals (today's present count on the teacher dashboard)
+CREATE TABLE IF NOT EXISTS attendance_daily (
+    teacher_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    present INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (teacher_id, date)
+) WITHOUT ROWID;
+
+DELETE FROM attendance_summary;
+INSERT INTO attendance_summary (student_id, teacher_id, subject, present, total)
+SELECT student_id, teacher_id, subject,
+       SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END), COUNT(*)
+FROM attendance
+GROUP BY student_id, teacher_id, subject;
+
+DELETE FROM attendance_daily;
+INSERT INTO attendance_daily (teacher_id, date, present, total)
+SELECT teacher_id, date,
+       SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END), COUNT(*)
+FROM attendance
+GROUP BY teacher_id, date;
+
+CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_insert
+AFTER INSERT ON attendance
+BEGIN
+    INSERT INTO attendance_summary (student_id, teacher_id, subject, present, total)
+    VALUES (NEW.student_id, NEW.teacher_id, NEW.subject, NEW.status = 'present', 1)
+    ON CONFLICT (student_id, teacher_id, subject) DO UPDATE
+    SET present = present + excluded.present, total = total + 1;
+
+    INSERT INTO attendance_daily (teacher_id, date, present, total)
+    VALUES (NEW.teacher_id, NEW.date, NEW.status = 'present', 1)
+    ON CONFLICT (teacher_id, date) DO UPDATE
+    SET present = present + excluded.present, total = total + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_delete
+AFTER DELETE ON attendance
+BEGIN
+    UPDATE attendance_summary
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject;
+    DELETE FROM attendance_summary
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject
+      AND total <= 0;
+
+    UPDATE attendance_daily
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date;
+    DELETE FROM attendance_daily
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date AND total <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_update
+AFTER UPDATE OF student_id, teacher_id, date, status, subject ON attendance
+BEGIN
+    UPDATE attendance_summary
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject;
+    DELETE FROM attendance_summary
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject
+      AND total <= 0;
+    INSERT INTO attendance_summary (student_id, teacher_id, subject, present, total)
+    VALUES (NEW.student_id, NEW.teacher_id, NEW.subject, NEW.status = 'present', 1)
+    ON CONFLICT (student_id, teacher_id, subject) DO UPDATE
+    SET present = present + excluded.present, total = total + 1;
+
+    UPDATE attendance_daily
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date;
+    DELETE FROM attendance_daily
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date AND total <= 0;
+    INSERT INTO attendance_daily (teacher_id, date, present, total)
+    VALUES (NEW.teacher_id, NEW.date, NEW.status = 'present', 1)
+    ON CONFLICT (teacher_id, date) DO UPDATE
+    SET present = present + excluded.present, total = total + 1;
+END;
@@ -0,0 +1,4 @@
+-- Keyset pagination of a student's history on (date, id); the rowid is
+-- implicitly the last column of the index.
+CREATE INDEX IF NOT EXISTS ix_attendance_student_date
+    ON attendance (student_id, date);
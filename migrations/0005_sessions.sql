@@ -0,0 +1,12 @@
+-- Server-side sessions (SESSION_BACKEND = 'sqlite'); the cookie carries only
+-- the random sid. user_id is indexed so an admin edit can revoke a user's
+-- sessions, expires so the sweeper can drop stale ones.
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    user_id INTEGER,
+    data TEXT NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS ix_sessions_user ON sessions (user_id);
+CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires);
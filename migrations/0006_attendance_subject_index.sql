@@ -0,0 +1,5 @@
+-- Analytics load one subject's attendance grouped by date; covering every
+-- column they read (including the optional teacher filter) lets SQLite
+-- answer from the index alone, in date then student order.
+CREATE INDEX IF NOT EXISTS ix_attendance_subject_date
+    ON attendance (subject, date, student_id, status, teacher_id);
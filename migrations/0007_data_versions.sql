@@ -0,0 +1,55 @@
+-- Change counters for HTTP/response caching. Every write to attendance or
+-- to the user fields shown on pages bumps a counter, so all worker
+-- processes see the same version and cached pages become stale at once.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated INTEGER NOT NULL
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO data_versions (name, version, updated)
+VALUES ('attendance', 1, CAST(strftime('%s', 'now') AS INTEGER)),
+       ('users', 1, CAST(strftime('%s', 'now') AS INTEGER));
+
+CREATE TRIGGER IF NOT EXISTS trg_attendance_version_insert
+AFTER INSERT ON attendance
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'attendance';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_attendance_version_update
+AFTER UPDATE ON attendance
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'attendance';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_attendance_version_delete
+AFTER DELETE ON attendance
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'attendance';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_version_insert
+AFTER INSERT ON users
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
+
+-- Password changes (including rehash on login) do not affect rendered pages
+CREATE TRIGGER IF NOT EXISTS trg_users_version_update
+AFTER UPDATE OF username, role, name, subject ON users
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_version_delete
+AFTER DELETE ON users
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
@@ -0,0 +1,100 @@
+-- Academic terms and the archive that closed terms are moved into (see
+-- partitions.py). attendance_summary and attendance_daily keep counting
+-- archived rows, so all-time totals do not change when a term is archived;
+-- term_summary keeps each archived term's own totals.
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open',  -- open, archiving, archived
+    archived_at TEXT,
+    CHECK (start_date <= end_date)
+);
+
+CREATE INDEX IF NOT EXISTS ix_terms_status ON terms (status, start_date, end_date);
+
+CREATE TABLE IF NOT EXISTS attendance_archive (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL,
+    teacher_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    notes TEXT,
+    term_id INTEGER NOT NULL,
+    FOREIGN KEY (student_id) REFERENCES users (id),
+    FOREIGN KEY (teacher_id) REFERENCES users (id),
+    FOREIGN KEY (term_id) REFERENCES terms (id)
+);
+
+-- Same access paths as the live table
+CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_archive_student_date_subject
+    ON attendance_archive (student_id, date, subject);
+CREATE INDEX IF NOT EXISTS ix_attendance_archive_teacher_student
+    ON attendance_archive (teacher_id, student_id, status);
+CREATE INDEX IF NOT EXISTS ix_attendance_archive_date
+    ON attendance_archive (date);
+CREATE INDEX IF NOT EXISTS ix_attendance_archive_subject_date
+    ON attendance_archive (subject, date, student_id, status, teacher_id);
+
+CREATE TABLE IF NOT EXISTS term_summary (
+    term_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    teacher_id INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    present INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    PRIMARY KEY (term_id, student_id, teacher_id, subject)
+) WITHOUT ROWID;
+
+-- Rows leaving the live table for the archive keep their place in the
+-- all-time summaries: skip the decrement while a term is being archived
+DROP TRIGGER IF EXISTS trg_attendance_summary_delete;
+CREATE TRIGGER trg_attendance_summary_delete
+AFTER DELETE ON attendance
+WHEN NOT EXISTS (SELECT 1 FROM terms WHERE status = 'archiving')
+BEGIN
+    UPDATE attendance_summary
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject;
+    DELETE FROM attendance_summary
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject
+      AND total <= 0;
+
+    UPDATE attendance_daily
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date;
+    DELETE FROM attendance_daily
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date AND total <= 0;
+END;
+
+-- Deleting archived rows (e.g. with their student) does reduce the totals
+CREATE TRIGGER IF NOT EXISTS trg_attendance_archive_summary_delete
+AFTER DELETE ON attendance_archive
+BEGIN
+    UPDATE attendance_summary
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject;
+    DELETE FROM attendance_summary
+    WHERE student_id = OLD.student_id AND teacher_id = OLD.teacher_id AND subject = OLD.subject
+      AND total <= 0;
+
+    UPDATE attendance_daily
+    SET present = present - (OLD.status = 'present'), total = total - 1
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date;
+    DELETE FROM attendance_daily
+    WHERE teacher_id = OLD.teacher_id AND date = OLD.date AND total <= 0;
+
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'attendance';
+END;
+
+-- Archived terms are read-only: new marks for their dates would otherwise
+-- land in the live table next to the archived rows
+CREATE TRIGGER IF NOT EXISTS trg_attendance_term_guard
+BEFORE INSERT ON attendance
+WHEN EXISTS (SELECT 1 FROM terms WHERE status != 'open' AND NEW.date BETWEEN start_date AND end_date)
+BEGIN
+    SELECT RAISE(ABORT, 'attendance date falls in an archived term');
+END;
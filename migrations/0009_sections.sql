@@ -0,0 +1,57 @@
+-- Classes/sections: which students a teacher marks. Teachers without any
+-- section keep seeing every student.
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS section_teachers (
+    section_id INTEGER NOT NULL,
+    teacher_id INTEGER NOT NULL,
+    PRIMARY KEY (section_id, teacher_id),
+    FOREIGN KEY (section_id) REFERENCES sections (id) ON DELETE CASCADE,
+    FOREIGN KEY (teacher_id) REFERENCES users (id)
+) WITHOUT ROWID;
+
+-- A teacher's sections
+CREATE INDEX IF NOT EXISTS ix_section_teachers_teacher ON section_teachers (teacher_id, section_id);
+
+CREATE TABLE IF NOT EXISTS enrolments (
+    section_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    PRIMARY KEY (section_id, student_id),
+    FOREIGN KEY (section_id) REFERENCES sections (id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES users (id)
+) WITHOUT ROWID;
+
+-- A student's sections (the primary key serves a section's roster)
+CREATE INDEX IF NOT EXISTS ix_enrolments_student ON enrolments (student_id, section_id);
+
+-- Rosters are part of rendered pages, so changes bump the users version
+CREATE TRIGGER IF NOT EXISTS trg_enrolments_version_insert
+AFTER INSERT ON enrolments
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_enrolments_version_delete
+AFTER DELETE ON enrolments
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_section_teachers_version_insert
+AFTER INSERT ON section_teachers
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_section_teachers_version_delete
+AFTER DELETE ON section_teachers
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
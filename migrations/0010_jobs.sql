@@ -0,0 +1,23 @@
+-- Background job state, shared by every worker process. A run is claimed by
+-- setting status = 'running' while next_run is due, so only one worker runs it.
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'idle' CHECK (status IN ('idle', 'running', 'ok', 'failed')),
+    owner TEXT,
+    next_run REAL NOT NULL,
+    last_started REAL,
+    last_finished REAL,
+    last_duration_ms REAL,
+    last_error TEXT,
+    last_result TEXT,
+    runs INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0
+);
+
+-- Precomputed report data, replaced whole by the job that builds it
+CREATE TABLE IF NOT EXISTS report_snapshots (
+    name TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    data_version INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
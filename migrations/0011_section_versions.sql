@@ -0,0 +1,22 @@
+-- Creating, renaming or deleting a section changes the section lists on
+-- rendered pages too, so it bumps the users version like enrolments do
+CREATE TRIGGER IF NOT EXISTS trg_sections_version_insert
+AFTER INSERT ON sections
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sections_version_update
+AFTER UPDATE ON sections
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sections_version_delete
+AFTER DELETE ON sections
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = 'users';
+END;
@@ -0,0 +1,119 @@
+import sqlite3
+from datetime import date
+
+LIVE = 'attendance'
+ARCHIVE = 'attendance_archive'
+
+# Columns shared by the live and archive tables
+COLUMNS = ('id', 'student_id', 'teacher_id', 'date', 'status', 'subject', 'notes')
+
+# Every attendance row, live or archived, for all-time aggregates
+ALL_ROWS = f'''
+    SELECT {', '.join(COLUMNS)} FROM {LIVE}
+    UNION ALL
+    SELECT {', '.join(COLUMNS)} FROM {ARCHIVE}
+'''
+
+
+class TermError(Exception):
+    pass
+
+
+def sources(db, date_from=None, date_to=None):
+    """The attendance tables that can hold rows dated in ``[date_from, date_to]``.
+
+    The archive is only read when the range reaches back into an archived
+    term, and the live table is skipped when the whole range lies inside
+    one archived term (archived terms are read-only, see migration 0008).
+    """
+    first, last = db.execute(
+        "SELECT MIN(start_date), MAX(end_date) FROM terms WHERE status = 'archived'"
+    ).fetchone()
+    if first is None or (date_from and date_from > last) or (date_to and date_to < first):
+        return (LIVE,)
+    if date_from and date_to and db.execute(
+        "SELECT 1 FROM terms WHERE status = 'archived' AND start_date <= ? AND end_date >= ?",
+        (date_from, date_to)
+    ).fetchone():
+        return (ARCHIVE,)
+    return (LIVE, ARCHIVE)
+
+
+def archived_ranges(db):
+    return db.execute(
+        "SELECT start_date, end_date FROM terms WHERE status != 'open' ORDER BY start_date"
+    ).fetchall()
+
+
+def list_terms(db):
+    return db.execute('''
+        SELECT t.id, t.name, t.start_date, t.end_date, t.status, t.archived_at,
+               COALESCE(SUM(s.total), 0) AS archived_rows
+        FROM terms t
+        LEFT JOIN term_summary s ON s.term_id = t.id
+        GROUP BY t.id
+        ORDER BY t.start_date
+    ''').fetchall()
+
+
+def add_term(db, name, start_date, end_date):
+    try:
+        start_date = date.fromisoformat(start_date).isoformat()
+        end_date = date.fromisoformat(end_date).isoformat()
+    except ValueError:
+        raise TermError('Dates must be YYYY-MM-DD')
+    if start_date > end_date:
+        raise TermError('A term must start before it ends')
+    overlap = db.execute(
+        'SELECT name FROM terms WHERE start_date <= ? AND end_date >= ?', (end_date, start_date)
+    ).fetchone()
+    if overlap:
+        raise TermError(f'Overlaps term {overlap[0]}')
+    try:
+        term_id = db.execute(
+            'INSERT INTO terms (name, start_date, end_date) VALUES (?, ?, ?)', (name, start_date, end_date)
+        ).lastrowid
+    except sqlite3.IntegrityError:
+        raise TermError(f'Term {name} already exists')
+    db.commit()
+    return term_id
+
+
+def archive_term(db, name, today=None):
+    """Move a closed term's attendance into the archive in one transaction.
+
+    Per-term totals are written to ``term_summary``; the all-time summary
+    tables are left as they are. Returns the number of rows moved.
+    """
+    today = today or date.today().isoformat()
+    term = db.execute('SELECT id, start_date, end_date, status FROM terms WHERE name = ?', (name,)).fetchone()
+    if term is None:
+        raise TermError(f'No term named {name}')
+    term_id, start_date, end_date, status = term
+    if status != 'open':
+        raise TermError(f'Term {name} is already archived')
+    if end_date >= today:
+        raise TermError(f'Term {name} has not ended yet')
+
+    columns = ', '.join(COLUMNS)
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        db.execute("UPDATE terms SET status = 'archiving' WHERE id = ?", (term_id,))
+        moved = db.execute(f'''
+            INSERT INTO {ARCHIVE} ({columns}, term_id)
+            SELECT {columns}, ? FROM {LIVE} WHERE date BETWEEN ? AND ?
+        ''', (term_id, start_date, end_date)).rowcount
+        db.execute(f'''
+            INSERT INTO term_summary (term_id, student_id, teacher_id, subject, present, total)
+            SELECT term_id, student_id, teacher_id, subject,
+                   SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END), COUNT(*)
+            FROM {ARCHIVE} WHERE term_id = ?
+            GROUP BY student_id, teacher_id, subject
+        ''', (term_id,))
+        db.execute(f'DELETE FROM {LIVE} WHERE date BETWEEN ? AND ?', (start_date, end_date))
+        db.execute("UPDATE terms SET status = 'archived', archived_at = datetime('now') WHERE id = ?", (term_id,))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return moved
@@ -0,0 +1,238 @@
+import heapq
+from itertools import islice
+
+import partitions
+
+
+def percent(present, total):
+    return round((present / total) * 100, 2) if total > 0 else 0
+
+
+def _stat(row):
+    total = row['total_classes'] or 0
+    present = row['present_count'] or 0
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'total_classes': total,
+        'present_count': present,
+        'absent_count': total - present,
+        'attendance_percent': percent(present, total),
+    }
+
+
+def iter_student_stats(db, teacher_id=None, student_id=None, date_from=None, date_to=None, subject=None,
+                       sections=None):
+    """Total/present/percentage for every student in a single GROUP BY.
+
+    Optional filters restrict the attendance rows that are counted (by
+    teacher, subject and date range) or the students that are returned (one
+    student, or those enrolled in any of the ``sections`` ids).
+    Students without any matching attendance are still listed with zero
+    classes. Rows are yielded straight from the cursor.
+    """
+    join = ['a.student_id = u.id']
+    params = []
+    if teacher_id is not None:
+        join.append('a.teacher_id = ?')
+        params.append(teacher_id)
+    if subject:
+        join.append('a.subject = ?')
+        params.append(subject)
+    if date_from:
+        join.append('a.date >= ?')
+        params.append(date_from)
+    if date_to:
+        join.append('a.date <= ?')
+        params.append(date_to)
+
+    where = ["u.role = 'student'"]
+    where_params = []
+    if student_id is not None:
+        where.append('u.id = ?')
+        where_params.append(student_id)
+    if sections is not None:
+        sections = list(sections)
+        placeholders = ', '.join('?' * len(sections))
+        where.append(f'u.id IN (SELECT student_id FROM enrolments WHERE section_id IN ({placeholders}))')
+        where_params.extend(sections)
+
+    tables = partitions.sources(db, date_from, date_to)
+    if len(tables) == 1 and (date_from or date_to):
+        query = f'''
+            SELECT u.id, u.name,
+                   COUNT(a.id) AS total_classes,
+                   SUM(CASE WHEN a.status = 'present' THEN 1 ELSE 0 END) AS present_count
+            FROM users u
+            LEFT JOIN {tables[0]} a ON {' AND '.join(join)}
+            WHERE {' AND '.join(where)}
+            GROUP BY u.id
+            ORDER BY u.id
+        '''
+    else:
+        # Count per student in each table, then add up. Without a date range
+        # the materialized attendance_summary (live and archived rows) is used
+        filters = ' AND '.join(term[2:] for term in join[1:]) or '1'
+        if student_id is not None:
+            filters += ' AND student_id = ?'
+            params.append(student_id)
+        if not (date_from or date_to):
+            counts = f'''
+                SELECT student_id, SUM(total) AS total, SUM(present) AS present
+                FROM attendance_summary WHERE {filters} GROUP BY student_id
+            '''
+        else:
+            counts = ' UNION ALL '.join(f'''
+                SELECT student_id, COUNT(*) AS total,
+                       SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) AS present
+                FROM {table} WHERE {filters} GROUP BY student_id
+            ''' for table in tables)
+            params = params * len(tables)
+        query = f'''
+            SELECT u.id, u.name,
+                   SUM(a.total) AS total_classes,
+                   SUM(a.present) AS present_count
+            FROM users u
+            LEFT JOIN ({counts}) a ON a.student_id = u.id
+            WHERE {' AND '.join(where)}
+            GROUP BY u.id
+            ORDER BY u.id
+        '''
+    cursor = db.execute(query, params + where_params)
+    for row in cursor:
+        yield _stat(row)
+
+
+def student_stats(db, **filters):
+    return list(iter_student_stats(db, **filters))
+
+
+def summarize(db, student_id=None, teacher_id=None, date_from=None, date_to=None):
+    """Present/absent totals for the attendance rows matching the filters."""
+    where = []
+    params = []
+    if student_id is not None:
+        where.append('student_id = ?')
+        params.append(student_id)
+    if teacher_id is not None:
+        where.append('teacher_id = ?')
+        params.append(teacher_id)
+    if date_from:
+        where.append('date >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append('date <= ?')
+        params.append(date_to)
+
+    total = present = 0
+    for table in partitions.sources(db, date_from, date_to):
+        query = f'''
+            SELECT COUNT(*) AS total_classes,
+                   SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) AS present_count
+            FROM {table}
+        '''
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        row = db.execute(query, params).fetchone()
+        total += row['total_classes']
+        present += row['present_count'] or 0
+    return {
+        'total_classes': total,
+        'present_count': present,
+        'absent_count': total - present,
+        'attendance_percent': percent(present, total),
+    }
+
+
+def subject_stats(db, student_id):
+    """Per-subject present/absent totals for one student."""
+    # attendance_summary counts live and archived rows alike
+    rows = db.execute('''
+        SELECT subject, SUM(total) AS total, SUM(present) AS present
+        FROM attendance_summary
+        WHERE student_id = ?
+        GROUP BY subject
+        ORDER BY subject
+    ''', (student_id,)).fetchall()
+    return {
+        row['subject']: {
+            'present': row['present'],
+            'absent': row['total'] - row['present'],
+            'total': row['total'],
+        }
+        for row in rows
+    }
+
+
+def parse_cursor(value):
+    """Parse a ``date,id`` keyset cursor; invalid cursors start from the top."""
+    if not value:
+        return None
+    try:
+        cursor_date, cursor_id = value.rsplit(',', 1)
+        return cursor_date, int(cursor_id)
+    except ValueError:
+        return None
+
+
+def format_cursor(row):
+    return f"{row['date']},{row['id']}"
+
+
+def attendance_history(db, student_id=None, date_from=None, date_to=None, subject=None, cursor=None,
+                       limit=None):
+    """Attendance rows, newest first, as an iterator.
+
+    Rows are ordered by ``(date, id)`` descending so that ``cursor`` (the
+    last ``(date, id)`` already shown) can seek straight to the next page
+    through the index instead of skipping rows with OFFSET. When the range
+    reaches into archived terms, the live and archive tables are each read
+    in that order and merged, so neither needs a sort.
+    """
+    where = []
+    params = []
+    if student_id is not None:
+        where.append('a.student_id = ?')
+        params.append(student_id)
+    if date_from:
+        where.append('a.date >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append('a.date <= ?')
+        params.append(date_to)
+    if subject:
+        where.append('a.subject = ?')
+        params.append(subject)
+    if cursor is not None:
+        where.append('(a.date, a.id) < (?, ?)')
+        params.extend(cursor)
+    if limit is not None:
+        params.append(limit)
+
+    columns = ', '.join(f'a.{column}' for column in partitions.COLUMNS)
+    cursors = []
+    for table in partitions.sources(db, date_from, date_to):
+        query = f'''
+            SELECT {columns}, s.name AS student_name, t.name AS teacher_name
+            FROM {table} a
+            JOIN users s ON a.student_id = s.id
+            JOIN users t ON a.teacher_id = t.id
+        '''
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += ' ORDER BY a.date DESC, a.id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+        cursors.append(db.execute(query, params))
+    if len(cursors) == 1:
+        return cursors[0]
+    # Archived rows keep their original ids, so (date, id) stays unique
+    rows = heapq.merge(*cursors, key=lambda row: (row['date'], row['id']), reverse=True)
+    return islice(rows, limit) if limit is not None else rows
+
+
+def history_page(db, page_size, cursor=None, **filters):
+    """One page of :func:`attendance_history` plus the cursor for the next."""
+    rows = list(attendance_history(db, cursor=cursor, limit=page_size + 1, **filters))
+    next_cursor = format_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
@@ -0,0 +1,616 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from sqlalchemy import (Column, Integer, MetaData, String, Table, Text, and_, bindparam, create_engine, delete,
+                        event, func, insert, or_, select, union_all, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import StaticPool
+
+import attendance
+import partitions
+import summary
+
+# Columns a user record is returned with (the password hash only by find_login)
+USER_FIELDS = ('id', 'username', 'role', 'name', 'subject')
+UPDATABLE_USER_FIELDS = ('username', 'password', 'name', 'subject')
+
+
+class ConstraintError(Exception):
+    """Attendance rows broke a database constraint, e.g. naming a user that no longer exists."""
+
+
+class ArchivedTermError(ConstraintError):
+    """Attendance was written for a date inside an archived (read-only) term."""
+
+
+def _is_archived_term_error(error):
+    return 'archived term' in str(error)
+
+
+class SQLiteRepository:
+    """Users and attendance through the app's pooled ``sqlite3`` connections.
+
+    ``connect`` returns the connection to use (the request's ``get_db``).
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, connect):
+        self.connect = connect
+
+    # Users
+    def get_user(self, user_id):
+        row = self.connect().execute(
+            'SELECT id, username, role, name, subject FROM users WHERE id = ?', (user_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def find_login(self, username, role):
+        row = self.connect().execute(
+            'SELECT id, username, password, role, name, subject FROM users WHERE username = ? AND role = ?',
+            (username, role)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list_users(self, role):
+        rows = self.connect().execute(
+            'SELECT id, username, role, name, subject FROM users WHERE role = ? ORDER BY id', (role,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_users(self, role):
+        return self.connect().execute('SELECT COUNT(*) FROM users WHERE role = ?', (role,)).fetchone()[0]
+
+    def username_taken(self, username, exclude_id=None):
+        return self.connect().execute(
+            'SELECT 1 FROM users WHERE username = ? AND id IS NOT ?', (username, exclude_id)
+        ).fetchone() is not None
+
+    def add_user(self, username, password, role, name, subject=None):
+        db = self.connect()
+        user_id = db.execute(
+            'INSERT INTO users (username, password, role, name, subject) VALUES (?, ?, ?, ?, ?)',
+            (username, password, role, name, subject)
+        ).lastrowid
+        db.commit()
+        return user_id
+
+    def taken_usernames(self, usernames):
+        """The subset of ``usernames`` that already exist, in one query."""
+        return {
+            row[0] for row in self.connect().execute(
+                'SELECT username FROM users WHERE username IN (SELECT value FROM json_each(?))',
+                (json.dumps(list(usernames)),)
+            )
+        }
+
+    def add_users(self, rows):
+        """Insert ``(username, password, role, name, subject)`` tuples in one transaction."""
+        db = self.connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany('INSERT INTO users (username, password, role, name, subject) VALUES (?, ?, ?, ?, ?)', rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def update_user(self, user_id, **fields):
+        if not fields:
+            return
+        unknown = set(fields) - set(UPDATABLE_USER_FIELDS)
+        if unknown:
+            raise ValueError(f'Cannot update {", ".join(sorted(unknown))}')
+        db = self.connect()
+        db.execute(
+            f"UPDATE users SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+            (*fields.values(), user_id)
+        )
+        db.commit()
+
+    def delete_user(self, user_id):
+        # Attendance goes first (foreign keys); triggers adjust the summary
+        # tables in the same transaction
+        db = self.connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for table in (partitions.LIVE, partitions.ARCHIVE, 'term_summary'):
+                db.execute(f'DELETE FROM {table} WHERE student_id = ? OR teacher_id = ?', (user_id, user_id))
+            db.execute('DELETE FROM enrolments WHERE student_id = ?', (user_id,))
+            db.execute('DELETE FROM section_teachers WHERE teacher_id = ?', (user_id,))
+            db.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    # Sections
+    def sections(self, teacher_id=None):
+        """Sections with their student counts; only the teacher's when given."""
+        query = '''
+            SELECT s.id, s.name, (SELECT COUNT(*) FROM enrolments e WHERE e.section_id = s.id) AS students
+            FROM sections s
+        '''
+        params = ()
+        if teacher_id is not None:
+            query += ' JOIN section_teachers st ON st.section_id = s.id WHERE st.teacher_id = ?'
+            params = (teacher_id,)
+        return [dict(row) for row in self.connect().execute(query + ' ORDER BY s.name', params)]
+
+    def find_section(self, name):
+        row = self.connect().execute('SELECT id, name FROM sections WHERE name = ?', (name,)).fetchone()
+        return dict(row) if row else None
+
+    def add_section(self, name):
+        db = self.connect()
+        section_id = db.execute('INSERT INTO sections (name) VALUES (?)', (name,)).lastrowid
+        db.commit()
+        return section_id
+
+    def assign_teachers(self, section_id, teacher_ids):
+        db = self.connect()
+        db.executemany(
+            'INSERT OR IGNORE INTO section_teachers (section_id, teacher_id) VALUES (?, ?)',
+            [(section_id, teacher_id) for teacher_id in teacher_ids]
+        )
+        db.commit()
+
+    def enrol(self, section_id, student_ids):
+        db = self.connect()
+        added = db.executemany(
+            'INSERT OR IGNORE INTO enrolments (section_id, student_id) VALUES (?, ?)',
+            [(section_id, student_id) for student_id in student_ids]
+        ).rowcount
+        db.commit()
+        return added
+
+    def unenrol(self, section_id, student_ids):
+        db = self.connect()
+        removed = db.executemany(
+            'DELETE FROM enrolments WHERE section_id = ? AND student_id = ?',
+            [(section_id, student_id) for student_id in student_ids]
+        ).rowcount
+        db.commit()
+        return removed
+
+    def section_student_ids(self, section_id):
+        return [row[0] for row in self.connect().execute(
+            'SELECT student_id FROM enrolments WHERE section_id = ? ORDER BY student_id', (section_id,)
+        )]
+
+    def section_students(self, section_id):
+        """User records of one section's students, by id."""
+        rows = self.connect().execute(
+            '''
+            SELECT u.id, u.username, u.role, u.name, u.subject
+            FROM enrolments e JOIN users u ON u.id = e.student_id
+            WHERE e.section_id = ?
+            ORDER BY u.id
+            ''',
+            (section_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # Attendance
+    def record_attendance(self, rows):
+        try:
+            return attendance.record_attendance(self.connect(), rows)
+        except sqlite3.IntegrityError as e:
+            if _is_archived_term_error(e):
+                raise ArchivedTermError(str(e))
+            raise ConstraintError(str(e))
+
+    def day_marks(self, teacher_id, day, subject):
+        db = self.connect()
+        marks = {}
+        for table in partitions.sources(db, day, day):
+            for student_id, status, notes in db.execute(
+                f'SELECT student_id, status, notes FROM {table} WHERE teacher_id = ? AND date = ? AND subject = ?',
+                (teacher_id, day, subject)
+            ):
+                marks[student_id] = (status, notes)
+        return marks
+
+    def archived_ranges(self):
+        return [tuple(row) for row in partitions.archived_ranges(self.connect())]
+
+    # Materialized totals
+    def student_totals(self, student_id):
+        return summary.student_totals(self.connect(), student_id)
+
+    def teacher_day_totals(self, teacher_id, day):
+        return summary.teacher_day_totals(self.connect(), teacher_id, day)
+
+    def total_records(self):
+        return summary.total_records(self.connect())
+
+    def subjects(self):
+        return [row[0] for row in self.connect().execute(
+            'SELECT DISTINCT subject FROM attendance_summary ORDER BY subject'
+        )]
+
+    def data_versions(self):
+        return {
+            name: (version, updated)
+            for name, version, updated in self.connect().execute('SELECT name, version, updated FROM data_versions')
+        }
+
+    def stats(self):
+        return {'backend': self.backend}
+
+
+# Table definitions for SQLAlchemy Core; the schema itself is created by
+# schema.sql and migrations/
+metadata = MetaData()
+
+users = Table(
+    'users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String, nullable=False, unique=True),
+    Column('password', String, nullable=False),
+    Column('role', String, nullable=False),
+    Column('name', String, nullable=False),
+    Column('subject', String),
+)
+
+
+def _attendance_table(name, *extra):
+    return Table(
+        name, metadata,
+        Column('id', Integer, primary_key=True),
+        Column('student_id', Integer, nullable=False),
+        Column('teacher_id', Integer, nullable=False),
+        Column('date', String, nullable=False),
+        Column('status', String, nullable=False),
+        Column('subject', String, nullable=False),
+        Column('notes', Text),
+        *extra
+    )
+
+
+attendance_live = _attendance_table(partitions.LIVE)
+attendance_archive = _attendance_table(partitions.ARCHIVE, Column('term_id', Integer, nullable=False))
+
+term_summary = Table(
+    'term_summary', metadata,
+    Column('term_id', Integer, primary_key=True),
+    Column('student_id', Integer, primary_key=True),
+    Column('teacher_id', Integer, primary_key=True),
+    Column('subject', String, primary_key=True),
+    Column('present', Integer, nullable=False),
+    Column('total', Integer, nullable=False),
+)
+
+terms = Table(
+    'terms', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String, nullable=False),
+    Column('start_date', String, nullable=False),
+    Column('end_date', String, nullable=False),
+    Column('status', String, nullable=False),
+    Column('archived_at', String),
+)
+
+attendance_summary = Table(
+    'attendance_summary', metadata,
+    Column('student_id', Integer, primary_key=True),
+    Column('teacher_id', Integer, primary_key=True),
+    Column('subject', String, primary_key=True),
+    Column('present', Integer, nullable=False),
+    Column('total', Integer, nullable=False),
+)
+
+attendance_daily = Table(
+    'attendance_daily', metadata,
+    Column('teacher_id', Integer, primary_key=True),
+    Column('date', String, primary_key=True),
+    Column('present', Integer, nullable=False),
+    Column('total', Integer, nullable=False),
+)
+
+sections = Table(
+    'sections', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String, nullable=False, unique=True),
+)
+
+section_teachers = Table(
+    'section_teachers', metadata,
+    Column('section_id', Integer, primary_key=True),
+    Column('teacher_id', Integer, primary_key=True),
+)
+
+enrolments = Table(
+    'enrolments', metadata,
+    Column('section_id', Integer, primary_key=True),
+    Column('student_id', Integer, primary_key=True),
+)
+
+data_versions = Table(
+    'data_versions', metadata,
+    Column('name', String, primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('updated', Integer, nullable=False),
+)
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def make_engine(url, pool_size=10, pool_timeout=10.0, busy_timeout_ms=5000):
+    """A pooled SQLAlchemy engine; SQLite URLs get the same pragmas as ``db.ConnectionPool``."""
+    if url.startswith('sqlite') and (url.endswith(':memory:') or url.rstrip('/') == 'sqlite:'):
+        # One shared connection, or every checkout would see a new empty database
+        engine = create_engine(url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+    else:
+        engine = create_engine(url, pool_size=pool_size, max_overflow=0, pool_timeout=pool_timeout,
+                               pool_pre_ping=True)
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def configure(dbapi_connection, connection_record):
+            dbapi_connection.execute('PRAGMA journal_mode = WAL')
+            dbapi_connection.execute('PRAGMA synchronous = NORMAL')
+            dbapi_connection.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+            dbapi_connection.execute('PRAGMA foreign_keys = ON')
+    return engine
+
+
+def same_sqlite_file(url, path):
+    """Whether the SQLAlchemy ``url`` names the SQLite database file at ``path``."""
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return False
+    return os.path.realpath(url.database) == os.path.realpath(path)
+
+
+class SQLAlchemyRepository:
+    """Users and attendance through a pooled SQLAlchemy Core engine.
+
+    Works with any database that has the app's schema and supports
+    ``INSERT ... ON CONFLICT`` (SQLite and PostgreSQL).
+    """
+
+    backend = 'sqlalchemy'
+
+    def __init__(self, engine):
+        self.engine = engine
+        if engine.dialect.name not in _UPSERT_INSERTS:
+            raise ValueError(f'Unsupported database dialect: {engine.dialect.name}')
+        self._insert = _UPSERT_INSERTS[engine.dialect.name]
+
+    @contextmanager
+    def _write(self):
+        with self.engine.begin() as conn:
+            if self.engine.dialect.name == 'sqlite':
+                # Take the write lock up front, as db.py's callers do
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+            yield conn
+
+    def _rows(self, statement):
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(statement).mappings()]
+
+    def _scalar(self, statement):
+        with self.engine.connect() as conn:
+            return conn.execute(statement).scalar()
+
+    # Users
+    def _user_columns(self):
+        return [users.c[name] for name in USER_FIELDS]
+
+    def get_user(self, user_id):
+        rows = self._rows(select(*self._user_columns()).where(users.c.id == user_id))
+        return rows[0] if rows else None
+
+    def find_login(self, username, role):
+        rows = self._rows(
+            select(*self._user_columns(), users.c.password)
+            .where(users.c.username == username, users.c.role == role)
+        )
+        return rows[0] if rows else None
+
+    def list_users(self, role):
+        return self._rows(select(*self._user_columns()).where(users.c.role == role).order_by(users.c.id))
+
+    def count_users(self, role):
+        return self._scalar(select(func.count()).select_from(users).where(users.c.role == role))
+
+    def username_taken(self, username, exclude_id=None):
+        statement = select(users.c.id).where(users.c.username == username)
+        if exclude_id is not None:
+            statement = statement.where(users.c.id != exclude_id)
+        return self._scalar(statement.limit(1)) is not None
+
+    def add_user(self, username, password, role, name, subject=None):
+        with self._write() as conn:
+            result = conn.execute(insert(users).values(
+                username=username, password=password, role=role, name=name, subject=subject
+            ))
+            return result.inserted_primary_key[0]
+
+    def taken_usernames(self, usernames):
+        usernames = list(usernames)
+        taken = set()
+        with self.engine.connect() as conn:
+            # Chunked to stay under the driver's bound-parameter limit
+            for start in range(0, len(usernames), 500):
+                taken.update(conn.execute(
+                    select(users.c.username).where(users.c.username.in_(usernames[start:start + 500]))
+                ).scalars())
+        return taken
+
+    def add_users(self, rows):
+        rows = [dict(zip(('username', 'password', 'role', 'name', 'subject'), row)) for row in rows]
+        if rows:
+            with self._write() as conn:
+                conn.execute(insert(users), rows)
+
+    def update_user(self, user_id, **fields):
+        if not fields:
+            return
+        unknown = set(fields) - set(UPDATABLE_USER_FIELDS)
+        if unknown:
+            raise ValueError(f'Cannot update {", ".join(sorted(unknown))}')
+        with self._write() as conn:
+            conn.execute(update(users).where(users.c.id == user_id).values(**fields))
+
+    def delete_user(self, user_id):
+        with self._write() as conn:
+            for table in (attendance_live, attendance_archive, term_summary):
+                conn.execute(delete(table).where(or_(table.c.student_id == user_id, table.c.teacher_id == user_id)))
+            conn.execute(delete(enrolments).where(enrolments.c.student_id == user_id))
+            conn.execute(delete(section_teachers).where(section_teachers.c.teacher_id == user_id))
+            conn.execute(delete(users).where(users.c.id == user_id))
+
+    # Sections
+    def sections(self, teacher_id=None):
+        students = (
+            select(func.count()).select_from(enrolments)
+            .where(enrolments.c.section_id == sections.c.id).scalar_subquery()
+        )
+        statement = select(sections.c.id, sections.c.name, students.label('students'))
+        if teacher_id is not None:
+            statement = statement.join(section_teachers, section_teachers.c.section_id == sections.c.id).where(
+                section_teachers.c.teacher_id == teacher_id
+            )
+        return self._rows(statement.order_by(sections.c.name))
+
+    def find_section(self, name):
+        rows = self._rows(select(sections.c.id, sections.c.name).where(sections.c.name == name))
+        return rows[0] if rows else None
+
+    def add_section(self, name):
+        with self._write() as conn:
+            return conn.execute(insert(sections).values(name=name)).inserted_primary_key[0]
+
+    def _insert_missing(self, table, rows):
+        if not rows:
+            return 0
+        with self._write() as conn:
+            return conn.execute(self._insert(table).on_conflict_do_nothing(), rows).rowcount
+
+    def assign_teachers(self, section_id, teacher_ids):
+        self._insert_missing(section_teachers, [
+            {'section_id': section_id, 'teacher_id': teacher_id} for teacher_id in teacher_ids
+        ])
+
+    def enrol(self, section_id, student_ids):
+        return self._insert_missing(enrolments, [
+            {'section_id': section_id, 'student_id': student_id} for student_id in student_ids
+        ])
+
+    def unenrol(self, section_id, student_ids):
+        if not student_ids:
+            return 0
+        with self._write() as conn:
+            return conn.execute(delete(enrolments).where(
+                enrolments.c.section_id == section_id, enrolments.c.student_id.in_(list(student_ids))
+            )).rowcount
+
+    def section_student_ids(self, section_id):
+        with self.engine.connect() as conn:
+            return list(conn.execute(
+                select(enrolments.c.student_id).where(enrolments.c.section_id == section_id)
+                .order_by(enrolments.c.student_id)
+            ).scalars())
+
+    def section_students(self, section_id):
+        return self._rows(
+            select(*self._user_columns())
+            .join(enrolments, enrolments.c.student_id == users.c.id)
+            .where(enrolments.c.section_id == section_id)
+            .order_by(users.c.id)
+        )
+
+    # Attendance
+    def record_attendance(self, rows):
+        if not rows:
+            return 0, 0
+        keys = ('student_id', 'teacher_id', 'date', 'status', 'subject', 'notes')
+        values = [dict(zip(keys, row)) for row in rows]
+        groups = {}
+        for row in values:
+            groups.setdefault((row['date'], row['subject']), []).append(row['student_id'])
+
+        upsert = self._insert(attendance_live)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=['student_id', 'date', 'subject'],
+            set_={'status': upsert.excluded.status, 'notes': upsert.excluded.notes}
+        )
+        existing = (
+            select(func.count()).select_from(attendance_live)
+            .where(attendance_live.c.date == bindparam('day'), attendance_live.c.subject == bindparam('subj'),
+                   attendance_live.c.student_id.in_(bindparam('ids', expanding=True)))
+        )
+        try:
+            with self._write() as conn:
+                updated = sum(
+                    conn.execute(existing, {'day': day, 'subj': subject, 'ids': ids}).scalar()
+                    for (day, subject), ids in groups.items()
+                )
+                conn.execute(upsert, values)
+        except IntegrityError as e:
+            if _is_archived_term_error(e.orig):
+                raise ArchivedTermError(str(e.orig))
+            raise ConstraintError(str(e.orig))
+        return len(rows) - updated, updated
+
+    def day_marks(self, teacher_id, day, subject):
+        parts = [
+            select(table.c.student_id, table.c.status, table.c.notes)
+            .where(table.c.teacher_id == teacher_id, table.c.date == day, table.c.subject == subject)
+            for table in (attendance_live, attendance_archive)
+        ]
+        with self.engine.connect() as conn:
+            return {student_id: (status, notes) for student_id, status, notes in conn.execute(union_all(*parts))}
+
+    def archived_ranges(self):
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(
+                select(terms.c.start_date, terms.c.end_date)
+                .where(terms.c.status != 'open').order_by(terms.c.start_date)
+            )]
+
+    # Materialized totals
+    def student_totals(self, student_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(func.coalesce(func.sum(attendance_summary.c.present), 0),
+                       func.coalesce(func.sum(attendance_summary.c.total), 0))
+                .where(attendance_summary.c.student_id == student_id)
+            ).one()
+        return row[0], row[1]
+
+    def teacher_day_totals(self, teacher_id, day):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(attendance_daily.c.present, attendance_daily.c.total)
+                .where(and_(attendance_daily.c.teacher_id == teacher_id, attendance_daily.c.date == day))
+            ).first()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def total_records(self):
+        return self._scalar(select(func.coalesce(func.sum(attendance_summary.c.total), 0)))
+
+    def subjects(self):
+        with self.engine.connect() as conn:
+            return list(conn.execute(
+                select(attendance_summary.c.subject).distinct().order_by(attendance_summary.c.subject)
+            ).scalars())
+
+    def data_versions(self):
+        with self.engine.connect() as conn:
+            return {name: (version, updated) for name, version, updated in conn.execute(select(data_versions))}
+
+    def stats(self):
+        pool = self.engine.pool
+        return {
+            'backend': self.backend,
+            'dialect': self.engine.dialect.name,
+            'pool_size': pool.size() if hasattr(pool, 'size') else 1,
+            'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+        }
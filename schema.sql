@@ -1,7 +1,5 @@
-DROP TABLE IF EXISTS users;
-DROP TABLE IF EXISTS attendance;
-
-CREATE TABLE users (
+-- Baseline schema (version 1). Later changes live in migrations/.
+CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE NOT NULL,
     password TEXT NOT NULL,
@@ -10,7 +8,7 @@ CREATE TABLE users (
     subject TEXT
 );
 
-CREATE TABLE attendance (
+CREATE TABLE IF NOT EXISTS attendance (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     student_id INTEGER NOT NULL,
     teacher_id INTEGER NOT NULL,
@@ -20,4 +18,4 @@ CREATE TABLE attendance (
     notes TEXT,
     FOREIGN KEY (student_id) REFERENCES users (id),
     FOREIGN KEY (teacher_id) REFERENCES users (id)
-); 
\ No newline at end of file
+);
@@ -0,0 +1,250 @@
+import json
+import secrets
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class SessionRecord:
+    __slots__ = ('sid', 'user_id', 'data', 'expires')
+
+    def __init__(self, sid, user_id, data, expires):
+        self.sid = sid
+        self.user_id = user_id
+        self.data = data
+        self.expires = expires
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict whose contents live in a store; the cookie holds only the id."""
+
+    def __init__(self, initial=None, sid=None, expires=0.0):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.new = sid is None
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        # Issue a fresh id on the next save (call on login to prevent fixation)
+        self.rotate = True
+        self.modified = True
+
+
+class MemorySessionStore:
+    """Sessions kept in this process; only suitable for a single worker.
+
+    Data is held as compact JSON so a loaded session never shares mutable
+    values with the stored copy.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.revoked = 0
+
+    def _drop(self, sid):
+        record = self._records.pop(sid, None)
+        if record is not None and record.user_id is not None:
+            sids = self._by_user.get(record.user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._by_user[record.user_id]
+        return record
+
+    def load(self, sid):
+        with self._lock:
+            record = self._records.get(sid)
+            if record is not None and record.expires <= time.time():
+                self._drop(sid)
+                self.expired += 1
+                return None
+        if record is None:
+            return None
+        return SessionRecord(sid, record.user_id, json.loads(record.data), record.expires)
+
+    def save(self, record):
+        data = json.dumps(record.data, separators=(',', ':'))
+        with self._lock:
+            self._drop(record.sid)
+            self._records[record.sid] = record = SessionRecord(record.sid, record.user_id, data, record.expires)
+            if record.user_id is not None:
+                self._by_user.setdefault(record.user_id, set()).add(record.sid)
+
+    def touch(self, sid, expires):
+        with self._lock:
+            record = self._records.get(sid)
+            if record is not None:
+                record.expires = expires
+
+    def delete(self, sid):
+        with self._lock:
+            self._drop(sid)
+
+    def revoke_user(self, user_id):
+        with self._lock:
+            sids = list(self._by_user.get(user_id, ()))
+            for sid in sids:
+                self._drop(sid)
+            self.revoked += len(sids)
+            return len(sids)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            stale = [sid for sid, record in self._records.items() if record.expires <= now]
+            for sid in stale:
+                self._drop(sid)
+            self.expired += len(stale)
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._records),
+                'users': len(self._by_user),
+                'expired': self.expired,
+                'revoked': self.revoked,
+            }
+
+
+class SQLiteSessionStore:
+    """Sessions in the ``sessions`` table, shared by every worker process.
+
+    ``connect`` returns the connection to use (the request's ``get_db``).
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.revoked = 0
+
+    def load(self, sid):
+        row = self.connect().execute(
+            'SELECT user_id, data, expires FROM sessions WHERE sid = ?', (sid,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[2] <= time.time():
+            self.delete(sid)
+            with self._lock:
+                self.expired += 1
+            return None
+        return SessionRecord(sid, row[0], json.loads(row[1]), row[2])
+
+    def save(self, record):
+        db = self.connect()
+        db.execute(
+            'INSERT OR REPLACE INTO sessions (sid, user_id, data, expires) VALUES (?, ?, ?, ?)',
+            (record.sid, record.user_id, json.dumps(record.data, separators=(',', ':')), record.expires)
+        )
+        db.commit()
+
+    def touch(self, sid, expires):
+        db = self.connect()
+        db.execute('UPDATE sessions SET expires = ? WHERE sid = ?', (expires, sid))
+        db.commit()
+
+    def delete(self, sid):
+        db = self.connect()
+        db.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+        db.commit()
+
+    def revoke_user(self, user_id):
+        db = self.connect()
+        count = db.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,)).rowcount
+        db.commit()
+        with self._lock:
+            self.revoked += count
+        return count
+
+    def sweep(self):
+        db = self.connect()
+        count = db.execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),)).rowcount
+        db.commit()
+        with self._lock:
+            self.expired += count
+        return count
+
+    def stats(self):
+        row = self.connect().execute('SELECT COUNT(*), COUNT(DISTINCT user_id) FROM sessions').fetchone()
+        return {
+            'backend': 'sqlite',
+            'sessions': row[0],
+            'users': row[1],
+            'expired': self.expired,
+            'revoked': self.revoked,
+        }
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keep session data server-side in a pluggable store.
+
+    ``get_store`` returns the store; the app config supplies
+    ``SESSION_LIFETIME`` (idle seconds before a session expires),
+    ``SESSION_REFRESH_AFTER`` (how stale the expiry may get before an
+    unchanged session is written back) and ``SESSION_SWEEP_INTERVAL``.
+    """
+
+    def __init__(self, get_store):
+        self.get_store = get_store
+        self._next_sweep = 0.0
+
+    def open_session(self, app, request):
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + app.config['SESSION_SWEEP_INTERVAL']
+            self.get_store().sweep()
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            record = self.get_store().load(sid)
+            if record is not None:
+                return ServerSession(record.data, sid, record.expires)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        store = self.get_store()
+
+        if not session:
+            if session.sid is not None:
+                store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        response.vary.add('Cookie')
+        now = time.time()
+        expires = now + app.config['SESSION_LIFETIME']
+        if session.rotate and session.sid is not None:
+            store.delete(session.sid)
+            session.sid = None
+
+        if session.sid is None or session.modified:
+            new_cookie = session.sid is None
+            if new_cookie:
+                session.sid = secrets.token_urlsafe(32)
+            store.save(SessionRecord(session.sid, session.get('user_id'), dict(session), expires))
+            if new_cookie:
+                response.set_cookie(
+                    name, session.sid,
+                    domain=domain, path=path,
+                    httponly=self.get_cookie_httponly(app),
+                    secure=self.get_cookie_secure(app),
+                    samesite=self.get_cookie_samesite(app)
+                )
+        elif session.expires - app.config['SESSION_LIFETIME'] + app.config['SESSION_REFRESH_AFTER'] <= now:
+            # Sliding expiry, written back at most once per SESSION_REFRESH_AFTER
+            store.touch(session.sid, expires)
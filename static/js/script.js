@@ -8,6 +8,8 @@ document.addEventListener('DOMContentLoaded', function() {
     setupPasswordToggle();
     fadeInElements();
     fixModalIssues();
+    setupAttendanceDeltas();
+    setupLiveUpdates();
 });
 
 // Initialize Bootstrap tooltips
@@ -229,4 +231,133 @@ function markAllAbsent() {
             label.classList.add('status-absent');
         }
     });
-} 
\ No newline at end of file
+} 
+
+// Show a dismissible message like the server-side flash messages
+function showMessage(text) {
+    const container = document.querySelector('body > .container');
+    if (!container) return;
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-info alert-dismissible fade show';
+    alert.textContent = text;
+    const close = document.createElement('button');
+    close.type = 'button';
+    close.className = 'btn-close';
+    close.setAttribute('data-bs-dismiss', 'alert');
+    alert.appendChild(close);
+    container.prepend(alert);
+}
+
+// Current mark of one row of the marking grid
+function rowState(row) {
+    const id = row.dataset.studentId;
+    return {
+        status: document.getElementById('status_' + id).checked ? 'present' : 'absent',
+        notes: document.getElementById('note_' + id).value
+    };
+}
+
+// Set a row of the marking grid and its Present/Absent label
+function setRowState(row, status, notes) {
+    const id = row.dataset.studentId;
+    const checkbox = document.getElementById('status_' + id);
+    checkbox.checked = status === 'present';
+    const label = checkbox.nextElementSibling;
+    if (label && label.classList.contains('status-label')) {
+        label.textContent = checkbox.checked ? label.dataset.present : label.dataset.absent;
+    }
+    document.getElementById('note_' + id).value = notes;
+}
+
+// Save only the rows that changed since the grid was loaded, as JSON
+function setupAttendanceDeltas() {
+    const form = document.querySelector('form[data-delta-url]');
+    if (!form || !window.fetch) return;
+
+    const rows = form.querySelectorAll('tr[data-student-id]');
+    const dateInput = form.querySelector('input[name="date"]');
+    form.savedState = {};
+    rows.forEach(row => {
+        form.savedState[row.dataset.studentId] = rowState(row);
+    });
+
+    form.addEventListener('submit', function(e) {
+        // A different date starts a new roster: submit the whole form as before
+        if (dateInput.value !== form.dataset.date) return;
+        e.preventDefault();
+
+        const changes = [];
+        rows.forEach(row => {
+            const state = rowState(row);
+            const saved = form.savedState[row.dataset.studentId];
+            if (state.status !== saved.status || state.notes !== saved.notes) {
+                changes.push({student_id: Number(row.dataset.studentId), status: state.status, notes: state.notes});
+            }
+        });
+        if (changes.length === 0) {
+            showMessage('No changes to save.');
+            return;
+        }
+
+        fetch(form.dataset.deltaUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            credentials: 'same-origin',
+            body: JSON.stringify({date: form.dataset.date, changes: changes})
+        })
+            .then(response => response.json().then(data => ({ok: response.ok, data: data})))
+            .then(result => {
+                if (!result.ok) {
+                    showMessage(result.data.error || 'Could not save attendance.');
+                    return;
+                }
+                changes.forEach(change => {
+                    form.savedState[change.student_id] = {status: change.status, notes: change.notes};
+                });
+                showMessage('Attendance recorded successfully! (' + result.data.inserted + ' new, ' +
+                            result.data.updated + ' updated)');
+            })
+            .catch(() => form.submit());
+    });
+}
+
+// Apply pushed updates to the dashboards and the marking grid
+function setupLiveUpdates() {
+    const source = document.querySelector('[data-live-events]');
+    if (!source || !window.EventSource) return;
+
+    const events = new EventSource(source.dataset.liveEvents);
+
+    function updateCounts(data) {
+        document.querySelectorAll('[data-live]').forEach(element => {
+            const key = element.dataset.live;
+            if (!(key in data)) return;
+            if (element.dataset.liveDate && element.dataset.liveDate !== data.date) return;
+            element.textContent = data[key];
+        });
+    }
+
+    events.addEventListener('totals', e => updateCounts(JSON.parse(e.data)));
+
+    events.addEventListener('attendance', e => {
+        const data = JSON.parse(e.data);
+        updateCounts(data);
+
+        // Marks saved elsewhere (another tab, a kiosk) for the date on screen;
+        // rows with unsaved local edits are left alone
+        const form = document.querySelector('form[data-delta-url]');
+        if (!form || !form.savedState || form.dataset.date !== data.date || form.dataset.subject !== data.subject) return;
+        Object.keys(data.marks).forEach(id => {
+            const row = form.querySelector('tr[data-student-id="' + id + '"]');
+            if (!row) return;
+            const state = rowState(row);
+            const saved = form.savedState[id];
+            if (state.status !== saved.status || state.notes !== saved.notes) return;
+            const [status, notes] = data.marks[id];
+            setRowState(row, status, notes);
+            form.savedState[id] = {status: status, notes: notes};
+        });
+    });
+
+    window.addEventListener('beforeunload', () => events.close());
+}
\ No newline at end of file
@@ -0,0 +1,80 @@
+from partitions import ALL_ROWS
+
+# Archived rows stay counted in both summary tables
+SUMMARY_FROM_ATTENDANCE = f'''
+    SELECT student_id, teacher_id, subject,
+           SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) AS present,
+           COUNT(*) AS total
+    FROM ({ALL_ROWS})
+    GROUP BY student_id, teacher_id, subject
+'''
+
+DAILY_FROM_ATTENDANCE = f'''
+    SELECT teacher_id, date,
+           SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) AS present,
+           COUNT(*) AS total
+    FROM ({ALL_ROWS})
+    GROUP BY teacher_id, date
+'''
+
+
+def student_totals(db, student_id):
+    row = db.execute(
+        'SELECT COALESCE(SUM(present), 0), COALESCE(SUM(total), 0) FROM attendance_summary WHERE student_id = ?',
+        (student_id,)
+    ).fetchone()
+    return row[0], row[1]
+
+
+def teacher_day_totals(db, teacher_id, day):
+    row = db.execute(
+        'SELECT present, total FROM attendance_daily WHERE teacher_id = ? AND date = ?',
+        (teacher_id, day)
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def total_records(db):
+    return db.execute('SELECT COALESCE(SUM(total), 0) FROM attendance_summary').fetchone()[0]
+
+
+def verify(db):
+    """Compare the summary tables with a fresh aggregate of live and archived rows.
+
+    Returns a list of drift entries ``(table, key, stored, expected)`` where
+    ``stored``/``expected`` are ``(present, total)`` tuples or ``None``.
+    """
+    drift = []
+    checks = (
+        ('attendance_summary', SUMMARY_FROM_ATTENDANCE,
+         'SELECT student_id, teacher_id, subject, present, total FROM attendance_summary'),
+        ('attendance_daily', DAILY_FROM_ATTENDANCE,
+         'SELECT teacher_id, date, present, total FROM attendance_daily'),
+    )
+    for table, expected_sql, stored_sql in checks:
+        expected = {tuple(r[:-2]): (r[-2], r[-1]) for r in db.execute(expected_sql)}
+        stored = {tuple(r[:-2]): (r[-2], r[-1]) for r in db.execute(stored_sql)}
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                drift.append((table, key, stored.get(key), expected.get(key)))
+    return drift
+
+
+def rebuild(db):
+    """Recompute both summary tables from scratch in one transaction."""
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        db.execute('DELETE FROM attendance_summary')
+        db.execute(f'''
+            INSERT INTO attendance_summary (student_id, teacher_id, subject, present, total)
+            {SUMMARY_FROM_ATTENDANCE}
+        ''')
+        db.execute('DELETE FROM attendance_daily')
+        db.execute(f'''
+            INSERT INTO attendance_daily (teacher_id, date, present, total)
+            {DAILY_FROM_ATTENDANCE}
+        ''')
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrations
+from db import ConnectionPool
+from repository import SQLAlchemyRepository, SQLiteRepository, make_engine
+
+
+def migrate(conn):
+    migrations.migrate(conn, os.path.join(ROOT, 'schema.sql'), os.path.join(ROOT, 'migrations'))
+
+
+def sqlite_repository(path):
+    pool = ConnectionPool(path, max_size=1)
+    conn = pool.acquire()
+    migrate(conn)
+    return SQLiteRepository(lambda: conn), conn, lambda: (pool.release(conn), pool.close())
+
+
+def sqlalchemy_repository(url):
+    engine = make_engine(url, pool_size=2)
+    raw = engine.raw_connection()
+    migrate(raw.driver_connection)
+    return SQLAlchemyRepository(engine), raw.driver_connection, lambda: (raw.close(), engine.dispose())
+
+
+@pytest.fixture(params=['sqlite-file', 'sqlite-memory', 'sqlalchemy-file', 'sqlalchemy-memory'])
+def backend(request, tmp_path):
+    """``(repository, raw sqlite3 connection)`` for each storage backend.
+
+    The raw connection reaches the same database, for the setup (terms,
+    archiving) that is not part of the repository interface.
+    """
+    kind, where = request.param.split('-')
+    if kind == 'sqlite':
+        repository, conn, close = sqlite_repository(':memory:' if where == 'memory' else str(tmp_path / 'test.db'))
+    else:
+        repository, conn, close = sqlalchemy_repository(
+            'sqlite://' if where == 'memory' else f"sqlite:///{tmp_path / 'test.db'}"
+        )
+    yield repository, conn
+    close()
+
+
+@pytest.fixture
+def repository(backend):
+    return backend[0]
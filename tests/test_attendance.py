@@ -0,0 +1,33 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from attendance import FormError, build_rows, parse_id
+
+
+def form(*student_ids, **fields):
+    return MultiDict([('student_ids', student_id) for student_id in student_ids] + list(fields.items()))
+
+
+def test_build_rows():
+    rows = build_rows(form('5', '6', '5', status_5='on', note_6='sick'), '2', '2026-01-05', 'Math')
+    assert rows == [
+        (5, 2, '2026-01-05', 'present', 'Math', ''),
+        (6, 2, '2026-01-05', 'absent', 'Math', 'sick'),
+    ]
+
+
+@pytest.mark.parametrize('student_id', ['abc', '', '-1', '5.0', '²', '9' * 30])
+def test_build_rows_rejects_malformed_student_ids(student_id):
+    with pytest.raises(FormError):
+        build_rows(form('5', student_id), 2, '2026-01-05', 'Math')
+
+
+@pytest.mark.parametrize('day', ['', 'tomorrow', '2026-02-30'])
+def test_build_rows_rejects_malformed_dates(day):
+    with pytest.raises(FormError):
+        build_rows(form('5'), 2, day, 'Math')
+
+
+def test_parse_id():
+    assert parse_id('42') == 42
+    assert parse_id('0') is None and parse_id('') is None and parse_id('4 2') is None
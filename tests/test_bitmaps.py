@@ -0,0 +1,76 @@
+import pytest
+
+from bitmaps import AttendanceBitmaps
+from conftest import sqlite_repository
+
+DAYS = ['2026-01-05', '2026-01-06', '2026-01-07']
+
+
+@pytest.fixture
+def school(tmp_path):
+    """Two teachers sharing a subject, one with a second subject, and five students."""
+    repository, conn, close = sqlite_repository(str(tmp_path / 'bitmaps.db'))
+    first = repository.add_user('t1', 'h', 'teacher', 'First', 'Math')
+    second = repository.add_user('t2', 'h', 'teacher', 'Second', 'Math')
+    students = [repository.add_user(f's{i}', 'h', 'student', f'Student {i}') for i in range(5)]
+    yield repository, conn, (first, second), students
+    close()
+
+
+def write(repository, index, rows):
+    repository.record_attendance(rows)
+    if index is not None:
+        index.apply(rows)
+
+
+def mark_week(repository, index, teachers, students):
+    first, second = teachers
+    for n, day in enumerate(DAYS):
+        # Both teachers teach Math to different students on the same days
+        write(repository, index, [
+            (student, first, day, 'present' if (student + n) % 3 else 'absent', 'Math', '')
+            for student in students[:3]
+        ])
+        write(repository, index, [
+            (student, second, day, 'present' if (student + n) % 2 else 'absent', 'Math', '')
+            for student in students[3:]
+        ])
+        # The first teacher also marks the same students in a second subject
+        write(repository, index, [(student, first, day, 'present', 'Lab', '') for student in students[:2]])
+    # Re-marks: one by the original teacher, one by the other teacher (the row keeps its owner)
+    write(repository, index, [(students[0], first, DAYS[0], 'present', 'Math', 'late')])
+    write(repository, index, [(students[1], second, DAYS[1], 'absent', 'Math', '')])
+
+
+def assert_matches(index, repository, teachers, students):
+    for teacher in teachers:
+        for day in DAYS + ['2026-01-08']:
+            assert index.day_totals(teacher, day) == repository.teacher_day_totals(teacher, day), (teacher, day)
+    for student in students:
+        assert index.student_totals(student) == repository.student_totals(student), student
+    assert index.version == repository.data_versions()['attendance'][0]
+
+
+def test_built_index_matches_summary_tables(school):
+    repository, conn, teachers, students = school
+    mark_week(repository, None, teachers, students)
+    index = AttendanceBitmaps.build(conn)
+    assert index.day_totals(teachers[0], DAYS[0]) != index.day_totals(teachers[1], DAYS[0])
+    assert_matches(index, repository, teachers, students)
+
+
+def test_applied_writes_match_summary_tables(school):
+    repository, conn, teachers, students = school
+    write(repository, None, [(students[0], teachers[0], DAYS[0], 'absent', 'Math', '')])
+    index = AttendanceBitmaps.build(conn)
+    mark_week(repository, index, teachers, students)
+    assert not index.stale
+    assert_matches(index, repository, teachers, students)
+
+
+def test_write_before_origin_marks_index_stale(school):
+    repository, conn, teachers, students = school
+    write(repository, None, [(students[0], teachers[0], DAYS[1], 'present', 'Math', '')])
+    index = AttendanceBitmaps.build(conn)
+    write(repository, index, [(students[0], teachers[0], DAYS[0], 'present', 'Math', '')])
+    assert index.stale
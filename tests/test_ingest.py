@@ -0,0 +1,73 @@
+import os
+
+from ingest import CheckinQueue
+
+
+class Writer:
+    """Records written batches; fails while ``failing`` is set."""
+
+    def __init__(self):
+        self.batches = []
+        self.failing = False
+
+    def __call__(self, rows):
+        if self.failing:
+            raise RuntimeError('database is locked')
+        self.batches.append(list(rows))
+
+
+def row(student_id, status, day='2026-01-05'):
+    return (student_id, 2, day, status, 'Math', '')
+
+
+def spool_files(path):
+    return sorted(name for name in os.listdir(path) if os.path.getsize(path / name))
+
+
+def test_failed_batch_is_written_by_the_next_flush(tmp_path):
+    writer = Writer()
+    queue = CheckinQueue(writer, spool_dir=str(tmp_path))
+    queue._open_spool()
+    queue.submit([row(5, 'present')])
+    writer.failing = True
+    assert queue.flush() == 0
+    assert queue.stats()['pending'] == 1 and queue.stats()['failures'] == 1
+
+    writer.failing = False
+    queue.submit([row(6, 'present')])
+    assert queue.flush() == 2
+    assert sorted(writer.batches[0]) == [row(5, 'present'), row(6, 'present')]
+
+
+def test_restart_after_recovered_failure_replays_nothing(tmp_path):
+    writer = Writer()
+    queue = CheckinQueue(writer, spool_dir=str(tmp_path))
+    queue._open_spool()
+    queue.submit([row(5, 'present')])
+    writer.failing = True
+    queue.flush()
+    writer.failing = False
+    queue.flush()
+    queue.stop()
+    assert spool_files(tmp_path) == []
+
+    # A restart must not replay the committed row over marks made since
+    restarted = Writer()
+    CheckinQueue(restarted, spool_dir=str(tmp_path)).start().stop()
+    assert restarted.batches == []
+
+
+def test_crash_after_failed_flush_replays_newest_event(tmp_path):
+    writer = Writer()
+    queue = CheckinQueue(writer, spool_dir=str(tmp_path))
+    queue._open_spool()
+    queue.submit([row(5, 'present')])
+    writer.failing = True
+    queue.flush()
+    queue.submit([row(5, 'absent')])
+    queue._spool.close()  # the process dies here
+
+    restarted = Writer()
+    CheckinQueue(restarted, spool_dir=str(tmp_path)).start().stop()
+    assert restarted.batches == [[row(5, 'absent')]]
+    assert spool_files(tmp_path) == []
@@ -0,0 +1,138 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pytest
+
+from db import ConnectionPool
+from jobs import Job, JobBusy, JobScheduler
+from conftest import migrate
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    pool = ConnectionPool(path, max_size=1)
+    conn = pool.acquire()
+    migrate(conn)
+    pool.release(conn)
+    pool.close()
+    return path
+
+
+def make_scheduler(database, *jobs, stale_after=3600):
+    """A scheduler as one worker process would have it: its own connections, no background thread."""
+    pool = ConnectionPool(database, max_size=4)
+    local = threading.local()
+
+    def connect():
+        if not hasattr(local, 'conn'):
+            local.conn = pool.acquire()
+        return local.conn
+
+    scheduler = JobScheduler(connect, nullcontext, workers=1, stale_after=stale_after)
+    for job in jobs:
+        scheduler.add(job)
+    scheduler.register()
+    scheduler._pool = ThreadPoolExecutor(max_workers=1)
+    return scheduler
+
+
+def finish(*schedulers):
+    for scheduler in schedulers:
+        scheduler._pool.shutdown(wait=True)
+
+
+def counting_job(runs, name='count', **schedule):
+    def func():
+        runs.append(name)
+        return len(runs)
+    return Job(name, func, **(schedule or {'every': 60}))
+
+
+def job_row(scheduler, name):
+    return dict(scheduler.connect().execute('SELECT * FROM jobs WHERE name = ?', (name,)).fetchone())
+
+
+def test_two_schedulers_run_a_due_job_once(database):
+    runs = []
+    first = make_scheduler(database, counting_job(runs))
+    second = make_scheduler(database, counting_job(runs))
+    barrier = threading.Barrier(2)
+    started = {}
+
+    def tick(scheduler):
+        barrier.wait()
+        started[scheduler] = scheduler.tick()
+
+    threads = [threading.Thread(target=tick, args=(scheduler,)) for scheduler in (first, second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    finish(first, second)
+
+    assert runs == ['count']
+    assert sorted(started.values()) == [[], ['count']]
+    row = job_row(first, 'count')
+    assert row['status'] == 'ok' and row['runs'] == 1 and row['owner'] is None
+    assert row['next_run'] > time.time()
+
+
+def test_job_is_not_claimed_before_it_is_due(database):
+    runs = []
+    scheduler = make_scheduler(database, counting_job(runs, at='00:00'))
+    assert scheduler.tick() == []
+    scheduler.trigger('count')
+    assert scheduler.tick() == ['count']
+    finish(scheduler)
+    assert runs == ['count']
+
+
+def test_stale_run_is_claimed_again(database):
+    runs = []
+    crashed = make_scheduler(database, counting_job(runs), stale_after=60)
+    assert crashed._claim(crashed._jobs['count'], time.time())
+    other = make_scheduler(database, counting_job(runs), stale_after=60)
+    other.trigger('count')
+    assert other.tick() == []
+
+    # The crashed worker's claim is now older than stale_after
+    crashed.connect().execute('UPDATE jobs SET last_started = ?', (time.time() - 120,))
+    crashed.connect().commit()
+    assert other.tick() == ['count']
+    finish(crashed, other)
+    assert runs == ['count']
+
+
+def test_run_now_ignores_the_schedule(database):
+    runs = []
+    scheduler = make_scheduler(database, counting_job(runs, at='00:00'))
+    assert scheduler.run_now('count') == (1, None)
+    assert job_row(scheduler, 'count')['runs'] == 1
+    with pytest.raises(KeyError):
+        scheduler.run_now('missing')
+    finish(scheduler)
+
+
+def test_run_now_refuses_a_job_running_elsewhere(database):
+    runs = []
+    elsewhere = make_scheduler(database, counting_job(runs))
+    assert elsewhere._claim(elsewhere._jobs['count'], time.time())
+    scheduler = make_scheduler(database, counting_job(runs))
+    with pytest.raises(JobBusy):
+        scheduler.run_now('count')
+    finish(elsewhere, scheduler)
+    assert runs == []
+
+
+def test_failed_run_is_recorded(database):
+    def fail():
+        raise RuntimeError('boom')
+    scheduler = make_scheduler(database, Job('fail', fail, every=60))
+    result, error = scheduler.run_now('fail')
+    finish(scheduler)
+    assert result is None and error == 'RuntimeError: boom'
+    row = job_row(scheduler, 'fail')
+    assert row['status'] == 'failed' and row['failures'] == 1 and row['last_error'] == error
@@ -0,0 +1,173 @@
+import pytest
+
+import partitions
+from repository import ArchivedTermError, ConstraintError
+
+DAY = '2026-01-05'
+
+
+@pytest.fixture
+def people(repository):
+    teacher = repository.add_user('t1', 'hash-t', 'teacher', 'Teacher One', 'Math')
+    first = repository.add_user('s1', 'hash-1', 'student', 'Student One')
+    second = repository.add_user('s2', 'hash-2', 'student', 'Student Two')
+    return teacher, first, second
+
+
+def marks(teacher, first, second, status='absent', day=DAY):
+    return [
+        (first, teacher, day, 'present', 'Math', ''),
+        (second, teacher, day, status, 'Math', 'sick'),
+    ]
+
+
+# Users
+def test_get_user(repository, people):
+    _, first, _ = people
+    assert repository.get_user(first) == {
+        'id': first, 'username': 's1', 'role': 'student', 'name': 'Student One', 'subject': None
+    }
+    assert 'password' not in repository.get_user(first)
+    assert repository.get_user(9999) is None
+
+
+def test_find_login(repository, people):
+    teacher, _, _ = people
+    user = repository.find_login('t1', 'teacher')
+    assert user['id'] == teacher and user['password'] == 'hash-t' and user['subject'] == 'Math'
+    assert repository.find_login('t1', 'student') is None
+    assert repository.find_login('nobody', 'teacher') is None
+
+
+def test_list_and_count_users(repository, people):
+    teacher, first, second = people
+    assert [user['id'] for user in repository.list_users('student')] == [first, second]
+    assert [user['username'] for user in repository.list_users('teacher')] == ['t1']
+    assert repository.list_users('admin') == []
+    assert repository.count_users('student') == 2
+
+
+def test_add_user_rejects_duplicate_username(repository, people):
+    with pytest.raises(Exception):
+        repository.add_user('s1', 'hash', 'student', 'Again')
+    assert repository.username_taken('s1')
+    assert not repository.username_taken('s1', exclude_id=people[1])
+    assert not repository.username_taken('nobody')
+
+
+def test_bulk_add_users(repository, people):
+    repository.add_users([('s3', 'h', 'student', 'Three', None), ('t2', 'h', 'teacher', 'Two', 'Physics')])
+    assert repository.taken_usernames(['s1', 's3', 't2', 'nobody']) == {'s1', 's3', 't2'}
+    assert repository.find_login('t2', 'teacher')['subject'] == 'Physics'
+    repository.add_users([])
+
+
+def test_update_user(repository, people):
+    _, _, second = people
+    repository.update_user(second, name='Renamed', password='hash-new')
+    assert repository.get_user(second)['name'] == 'Renamed'
+    assert repository.find_login('s2', 'student')['password'] == 'hash-new'
+    repository.update_user(second)
+    with pytest.raises(ValueError):
+        repository.update_user(second, role='admin')
+
+
+def test_delete_user_removes_their_attendance(repository, people):
+    teacher, first, second = people
+    repository.record_attendance(marks(teacher, first, second))
+    section = repository.add_section('A')
+    repository.enrol(section, [first, second])
+    repository.delete_user(first)
+    assert repository.get_user(first) is None
+    assert repository.student_totals(first) == (0, 0)
+    assert repository.total_records() == 1
+    assert repository.section_student_ids(section) == [second]
+
+
+# Attendance
+def test_record_attendance_counts_inserts_and_updates(repository, people):
+    teacher, first, second = people
+    assert repository.record_attendance(marks(teacher, first, second)) == (2, 0)
+    assert repository.record_attendance(marks(teacher, first, second, status='present')) == (0, 2)
+    assert repository.record_attendance(marks(teacher, first, second, day='2026-01-06')) == (2, 0)
+    assert repository.record_attendance([]) == (0, 0)
+    assert repository.total_records() == 4
+
+
+def test_day_marks(repository, people):
+    teacher, first, second = people
+    repository.record_attendance(marks(teacher, first, second))
+    assert repository.day_marks(teacher, DAY, 'Math') == {first: ('present', ''), second: ('absent', 'sick')}
+    assert repository.day_marks(teacher, DAY, 'Physics') == {}
+    assert repository.day_marks(teacher, '2026-01-06', 'Math') == {}
+
+
+def test_totals(repository, people):
+    teacher, first, second = people
+    repository.record_attendance(marks(teacher, first, second))
+    repository.record_attendance(marks(teacher, first, second, status='present', day='2026-01-06'))
+    assert repository.student_totals(first) == (2, 2)
+    assert repository.student_totals(second) == (1, 2)
+    assert repository.teacher_day_totals(teacher, DAY) == (1, 2)
+    assert repository.teacher_day_totals(teacher, '2020-01-01') == (0, 0)
+    assert repository.subjects() == ['Math']
+
+
+def test_archived_term_is_read_only(backend, people):
+    repository, conn = backend
+    teacher, first, second = people
+    repository.record_attendance(marks(teacher, first, second))
+    partitions.add_term(conn, 'T1', '2026-01-01', '2026-01-31')
+    partitions.archive_term(conn, 'T1', today='2026-03-01')
+    assert repository.archived_ranges() == [('2026-01-01', '2026-01-31')]
+    assert repository.day_marks(teacher, DAY, 'Math') == {first: ('present', ''), second: ('absent', 'sick')}
+    with pytest.raises(ArchivedTermError):
+        repository.record_attendance(marks(teacher, first, second, status='present'))
+    assert repository.student_totals(second) == (0, 1)
+    assert repository.record_attendance(marks(teacher, first, second, day='2026-02-02')) == (2, 0)
+
+
+def test_record_attendance_for_missing_user_raises_constraint_error(repository, people):
+    teacher, first, second = people
+    with pytest.raises(ConstraintError):
+        repository.record_attendance(marks(teacher, first, 9999))
+    assert repository.total_records() == 0
+    assert not issubclass(ConstraintError, ArchivedTermError) and issubclass(ArchivedTermError, ConstraintError)
+
+
+# Sections
+def test_sections(repository, people):
+    teacher, first, second = people
+    section = repository.add_section('A')
+    other = repository.add_section('B')
+    assert repository.find_section('A') == {'id': section, 'name': 'A'}
+    assert repository.find_section('Z') is None
+    repository.assign_teachers(section, [teacher])
+    repository.assign_teachers(section, [teacher])
+    assert repository.enrol(section, [first, second]) == 2
+    assert repository.enrol(section, [first]) == 0
+    assert repository.section_student_ids(section) == [first, second]
+    assert repository.section_students(section) == [repository.get_user(first), repository.get_user(second)]
+    assert repository.section_students(other) == []
+    assert [(s['name'], s['students']) for s in repository.sections()] == [('A', 2), ('B', 0)]
+    assert [s['id'] for s in repository.sections(teacher_id=teacher)] == [section]
+    assert repository.unenrol(section, [first, other]) == 1
+    assert repository.section_student_ids(section) == [second]
+
+
+# Change tracking
+def test_data_versions(repository, people):
+    teacher, first, second = people
+    before = repository.data_versions()
+    assert set(before) == {'attendance', 'users'}
+    repository.record_attendance(marks(teacher, first, second))
+    after = repository.data_versions()
+    assert after['attendance'][0] == before['attendance'][0] + 2
+    assert after['users'][0] == before['users'][0]
+    repository.update_user(first, name='Renamed')
+    assert repository.data_versions()['users'][0] > after['users'][0]
+    renamed = repository.data_versions()['users'][0]
+    section = repository.add_section('A')
+    assert repository.data_versions()['users'][0] > renamed
+    repository.enrol(section, [first])
+    assert repository.data_versions()['users'][0] > renamed + 1
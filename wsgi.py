@@ -0,0 +1,17 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+``python wsgi.py`` serves the same app with Werkzeug's threaded server
+(without the debugger or reloader) where gunicorn is not available, such
+as on Windows.
+"""
+import os
+
+from app import create_app
+
+app = create_app()
+
+if __name__ == '__main__':
+    from werkzeug.serving import run_simple
+    run_simple(os.environ.get('HOST', '127.0.0.1'), int(os.environ.get('PORT', 8000)), app, threaded=True)